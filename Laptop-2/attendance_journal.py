@@ -0,0 +1,142 @@
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+import logging
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+PUSH_CHARS = '-0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ_abcdefghijklmnopqrstuvwxyz'
+
+_last_push_time = 0
+_last_random = [0] * 12
+_push_lock = threading.Lock()
+
+def generate_push_key():
+    """Firebase push() style key; keys made in the same millisecond still sort in creation order"""
+    global _last_push_time
+    with _push_lock:
+        now = int(time.time() * 1000)
+        if now == _last_push_time:
+            for i in range(11, -1, -1):
+                if _last_random[i] < 63:
+                    _last_random[i] += 1
+                    break
+                _last_random[i] = 0
+        else:
+            _last_push_time = now
+            for i in range(12):
+                _last_random[i] = random.randrange(64)
+        suffix = ''.join(PUSH_CHARS[value] for value in _last_random)
+
+    timestamp = []
+    for _ in range(8):
+        timestamp.append(PUSH_CHARS[now % 64])
+        now //= 64
+    return ''.join(reversed(timestamp)) + suffix
+
+class AttendanceJournal:
+    """Durable write-behind queue: records are journaled in SQLite, then flushed to Firebase in order"""
+
+    def __init__(self, path, batch_size=200):
+        self.path = path
+        self.batch_size = batch_size
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=FULL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS pending ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " log_key TEXT NOT NULL,"
+            " record TEXT NOT NULL,"
+            " attempts INTEGER NOT NULL DEFAULT 0)"
+        )
+        self.conn.commit()
+
+        self.queued = 0
+        self.flushed = 0
+        self.retried = 0
+
+    def append(self, record):
+        """Persist one attendance record; returns once it is safely on disk"""
+        with self.lock:
+            self.conn.execute(
+                "INSERT INTO pending (log_key, record) VALUES (?, ?)",
+                (generate_push_key(), json.dumps(record))
+            )
+            self.conn.commit()
+            self.queued += 1
+        self.wakeup.set()
+
+    def pending_records(self, limit=None):
+        """Journaled records not yet flushed, oldest first"""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT id, log_key, record FROM pending ORDER BY id LIMIT ?", (limit or -1,)
+            ).fetchall()
+        return [(row_id, log_key, json.loads(record)) for row_id, log_key, record in rows]
+
+    def pending_count(self):
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM pending").fetchone()[0]
+
+    @staticmethod
+    def build_update(batch):
+        """One multi-path update covering every record in the batch"""
+        updates = {}
+        for _, log_key, record in batch:
+            updates[f"attendance/{record['date']}/{record['student_id']}/lecture{record['lecture']}"] = "Present"
+            updates[f"attendance_logs/{log_key}"] = record
+
+        last = batch[-1][2]
+        updates["system/laptop2_status/status"] = "connected"
+        updates["system/laptop2_status/last_update"] = datetime.now().isoformat()
+        updates["system/laptop2_status/last_recognition"] = (
+            f"{last['student_name']} (Confidence: {last['confidence']:.2f})"
+        )
+        return updates
+
+    def flush(self, db):
+        """Send the oldest pending batch to Firebase; returns the number of records flushed"""
+        batch = self.pending_records(self.batch_size)
+        if not batch or not db:
+            return 0
+
+        ids = [row_id for row_id, _, _ in batch]
+        placeholders = ",".join("?" * len(ids))
+        try:
+            db.update(self.build_update(batch))
+        except Exception:
+            with self.lock:
+                self.conn.execute(f"UPDATE pending SET attempts = attempts + 1 WHERE id IN ({placeholders})", ids)
+                self.conn.commit()
+                self.retried += len(ids)
+            raise
+
+        with self.lock:
+            self.conn.execute(f"DELETE FROM pending WHERE id IN ({placeholders})", ids)
+            self.conn.commit()
+            self.flushed += len(ids)
+        return len(ids)
+
+    def stats(self):
+        return {
+            "queued": self.queued,
+            "flushed": self.flushed,
+            "retried": self.retried,
+            "pending": self.pending_count(),
+        }
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
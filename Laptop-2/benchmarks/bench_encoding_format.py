@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+Benchmark for stored face encoding formats
+Compares JSON size, decode time and distance error of the formats in encoding_format.py.
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from encoding_format import encode_encoding, decode_encoding, DTYPES
+
+def synthetic_students(count, seed=0):
+    rng = np.random.default_rng(seed)
+    encodings = rng.normal(0, 0.09, (count, 128)).astype(np.float64)
+    return encodings, {
+        f"S{i:05d}": {"id": f"S{i:05d}", "name": f"Student {i}", "stream": "MCA", "updated_at": 1700000000000 + i}
+        for i in range(count)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Face encoding format benchmark")
+    parser.add_argument("--students", type=int, default=2000)
+    args = parser.parse_args()
+
+    encodings, students = synthetic_students(args.students)
+    probe = encodings[0] + np.random.default_rng(1).normal(0, 0.02, 128)
+    true_dist = np.linalg.norm(encodings - probe, axis=1)
+
+    variants = [("json floats (old)", lambda enc: enc.tolist())]
+    variants += [(name, lambda enc, f=name: encode_encoding(enc, f)) for name in DTYPES]
+
+    print(f"{'format':>18} {'bytes/student':>14} {'parse ms':>9} {'max dist err':>13}")
+    for name, encode in variants:
+        node = {sid: dict(record, face_encoding=encode(enc)) for (sid, record), enc in zip(students.items(), encodings)}
+        body = json.dumps(node)
+
+        start = time.perf_counter()
+        decoded = np.stack([decode_encoding(record["face_encoding"]) for record in json.loads(body).values()])
+        elapsed = (time.perf_counter() - start) * 1000
+
+        error = np.abs(np.linalg.norm(decoded - probe, axis=1) - true_dist).max()
+        print(f"{name:>18} {len(body) / args.students:>14.0f} {elapsed:>9.1f} {error:>13.5f}")
+
+if __name__ == "__main__":
+    main()
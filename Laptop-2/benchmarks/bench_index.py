@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Recall vs latency benchmark for gallery indexes
+Compares the exact index with the IVF index at several probe counts on clustered synthetic galleries.
+"""
+
+import os
+import sys
+import time
+import argparse
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from gallery import FaceGallery, ENCODING_DIM
+from gallery_index import BruteForceIndex, IVFIndex
+
+def clustered_gallery(size, groups=64, seed=0):
+    """Encodings drawn around a few dozen centres, like faces of similar appearance"""
+    rng = np.random.default_rng(seed)
+    centres = rng.normal(0, 0.09, (groups, ENCODING_DIM))
+    encodings = centres[rng.integers(0, groups, size)] + rng.normal(0, 0.05, (size, ENCODING_DIM))
+    ids = [f"S{i:06d}" for i in range(size)]
+    return FaceGallery.from_records(zip(ids, ids, encodings)).freeze()
+
+def time_frames(index, frames, repeats):
+    timings = []
+    for _ in range(repeats):
+        for faces in frames:
+            start = time.perf_counter()
+            index.match(faces)
+            timings.append(time.perf_counter() - start)
+    return np.median(timings) * 1000
+
+def recall(index, exact, frames):
+    hits = total = 0
+    for faces in frames:
+        for a, b in zip(index.match(faces), exact.match(faces)):
+            hits += a[0][0] == b[0][0]
+            total += 1
+    return hits / total
+
+def main():
+    parser = argparse.ArgumentParser(description="Gallery index recall/latency benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000, 100000])
+    parser.add_argument("--probes", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument("--faces", type=int, default=10, help="faces per frame")
+    parser.add_argument("--frames", type=int, default=20)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(1)
+    print(f"{'gallery':>8} {'index':>10} {'build ms':>9} {'frame ms':>9} {'recall@1':>9}")
+
+    for size in args.sizes:
+        gallery = clustered_gallery(size)
+        # Frames contain noisy captures of enrolled students
+        frames = []
+        for _ in range(args.frames):
+            picks = rng.integers(0, size, args.faces)
+            frames.append(gallery.matrix[picks] + rng.normal(0, 0.02, (args.faces, ENCODING_DIM)))
+
+        exact = BruteForceIndex(gallery)
+        print(f"{size:>8} {'exact':>10} {0:>9.1f} {time_frames(exact, frames, args.repeats):>9.2f} {1.0:>9.3f}")
+
+        start = time.perf_counter()
+        ivf = IVFIndex(gallery, n_probe=args.probes[0])
+        build_ms = (time.perf_counter() - start) * 1000
+
+        for n_probe in args.probes:
+            ivf.n_probe = n_probe
+            latency = time_frames(ivf, frames, args.repeats)
+            print(f"{size:>8} {f'ivf/{n_probe}':>10} {build_ms:>9.1f} {latency:>9.2f} {recall(ivf, exact, frames):>9.3f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Benchmark for gallery matching
+Compares per-face compare_faces/face_distance with the batched FaceGallery.match.
+"""
+
+import os
+import sys
+import time
+import argparse
+import numpy as np
+import face_recognition
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from gallery import FaceGallery, ENCODING_DIM
+
+def synthetic_gallery(size, seed=0):
+    """Random unit-scale encodings resembling dlib face descriptors"""
+    rng = np.random.default_rng(seed)
+    encodings = rng.normal(0, 0.09, (size, ENCODING_DIM))
+    ids = [f"S{i:06d}" for i in range(size)]
+    return encodings, ids
+
+def per_face_path(known_encodings, known_ids, face_encodings):
+    """Matching as previously done in AttendanceSystem.process_frame"""
+    results = []
+    for face_encoding in face_encodings:
+        matches = face_recognition.compare_faces(known_encodings, face_encoding)
+        face_distances = face_recognition.face_distance(known_encodings, face_encoding)
+        best_match_index = np.argmin(face_distances)
+        results.append(known_ids[best_match_index] if matches[best_match_index] else None)
+    return results
+
+def batched_path(gallery, face_encodings):
+    """Matching through FaceGallery"""
+    return [c[0][0] if c[0][2] <= 0.6 else None for c in gallery.match(face_encodings)]
+
+def time_call(fn, repeats):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return np.median(timings) * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description="Gallery matching benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 2000, 10000, 50000])
+    parser.add_argument("--faces", type=int, default=10, help="faces per frame")
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{'gallery':>8} {'per-face ms':>12} {'batched ms':>11} {'speedup':>8}")
+    for size in args.sizes:
+        encodings, ids = synthetic_gallery(size)
+        # Faces in the frame are perturbed copies of enrolled students
+        rng = np.random.default_rng(1)
+        picks = rng.integers(0, size, args.faces)
+        faces = encodings[picks] + rng.normal(0, 0.02, (args.faces, ENCODING_DIM))
+
+        known_list = list(encodings)
+        gallery = FaceGallery.from_records(zip(ids, ids, encodings))
+
+        assert per_face_path(known_list, ids, faces) == batched_path(gallery, faces)
+
+        old_ms = time_call(lambda: per_face_path(known_list, ids, faces), args.repeats)
+        new_ms = time_call(lambda: batched_path(gallery, faces), args.repeats)
+        print(f"{size:>8} {old_ms:>12.2f} {new_ms:>11.2f} {old_ms / new_ms:>7.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Benchmark for motion gating
+Compares the original two-frame detect_motion with utils.MotionDetector at several scales and sampling rates.
+"""
+
+import os
+import sys
+import time
+import argparse
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import MotionDetector
+
+def synthetic_frames(count, width=640, height=480, seed=0):
+    """Static noisy background with a block walking across it"""
+    rng = np.random.default_rng(seed)
+    background = rng.integers(0, 255, (height, width, 3), dtype=np.uint8)
+    frames = []
+    for i in range(count):
+        frame = background.copy()
+        x = (i * 8) % (width - 80)
+        frame[150:330, x:x + 80] = 200
+        frames.append(frame)
+    return frames
+
+def full_resolution_path(frames, threshold=5000):
+    """Motion detection as originally done in AttendanceSystem.camera_thread"""
+    prev_frame = None
+    detected = 0
+    for frame in frames:
+        if prev_frame is not None:
+            gray1 = cv2.cvtColor(prev_frame, cv2.COLOR_BGR2GRAY)
+            gray2 = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+            diff = cv2.absdiff(gray1, gray2)
+            _, thresh = cv2.threshold(diff, 25, 255, cv2.THRESH_BINARY)
+            detected += np.sum(thresh) > threshold
+        prev_frame = frame.copy()
+    return detected
+
+def detector_path(frames, **options):
+    detector = MotionDetector(**options)
+    return sum(detector.detect_motion(frame)[0] for frame in frames)
+
+def main():
+    parser = argparse.ArgumentParser(description="Motion gating benchmark")
+    parser.add_argument("--frames", type=int, default=300)
+    args = parser.parse_args()
+
+    frames = synthetic_frames(args.frames)
+    variants = [("full-res diff (old)", lambda: full_resolution_path(frames))]
+    for scale in (0.5, 0.25):
+        for sample_every in (1, 2, 4):
+            variants.append((
+                f"diff scale={scale} every={sample_every}",
+                lambda s=scale, n=sample_every: detector_path(frames, scale=s, sample_every=n)
+            ))
+    variants.append(("mog2 scale=0.25", lambda: detector_path(frames, method="mog2")))
+
+    print(f"{'variant':>28} {'us/frame':>9} {'motion frames':>14}")
+    for name, fn in variants:
+        start = time.perf_counter()
+        detected = fn()
+        elapsed = (time.perf_counter() - start) / args.frames * 1e6
+        print(f"{name:>28} {elapsed:>9.1f} {detected:>14}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Benchmark for group-photo attendance
+Times tiled detection/encoding, matching and the commit on a synthetic classroom photo.
+"""
+
+import os
+import sys
+import time
+import argparse
+import numpy as np
+import cv2
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from bench_recognition import UPLOADS_DIR, load_faces, gallery_students, synthetic_background
+from frame_sources import IMAGE_EXTENSIONS
+from photo_attendance import PhotoAttendance
+from storage import MemoryStorage
+
+def group_photo(faces, count, width, height, face_size, seed=0):
+    """JPEG bytes of count faces laid out in rows, like a class photo"""
+    rng = np.random.default_rng(seed)
+    photo = synthetic_background(width, height, rng)
+    columns = int(np.ceil(np.sqrt(count * width / height)))
+    cell_w, cell_h = width // columns, height // int(np.ceil(count / columns))
+    for i in range(count):
+        face = faces[rng.integers(len(faces))][2]
+        size = min(int(rng.integers(face_size[0], face_size[1] + 1)), cell_w - 4)
+        patch = cv2.resize(face, (size, min(cell_h - 4, size * face.shape[0] // face.shape[1])))
+        top = (i // columns) * cell_h + int(rng.integers(0, cell_h - patch.shape[0]))
+        left = (i % columns) * cell_w + int(rng.integers(0, cell_w - patch.shape[1]))
+        photo[top:top + patch.shape[0], left:left + patch.shape[1]] = patch
+    return cv2.imencode(".jpg", photo, [cv2.IMWRITE_JPEG_QUALITY, 90])[1].tobytes()
+
+def main():
+    parser = argparse.ArgumentParser(description="Group-photo attendance benchmark")
+    parser.add_argument("--faces", type=int, default=60, help="faces per photo")
+    parser.add_argument("--photos", type=int, default=1)
+    parser.add_argument("--width", type=int, default=4000)
+    parser.add_argument("--height", type=int, default=3000)
+    parser.add_argument("--face-size", type=int, nargs=2, default=[150, 260], metavar=("MIN", "MAX"))
+    parser.add_argument("--gallery-size", type=int, default=2000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, os.cpu_count()])
+    parser.add_argument("--upsample", type=int, default=0)
+    args = parser.parse_args()
+
+    faces = load_faces(sorted(os.path.join(UPLOADS_DIR, p) for p in os.listdir(UPLOADS_DIR)
+                              if p.lower().endswith(IMAGE_EXTENSIONS)))
+    photos = [(f"photo{i}.jpg", group_photo(faces, args.faces, args.width, args.height, args.face_size, seed=i))
+              for i in range(args.photos)]
+    students = gallery_students(faces, args.gallery_size)
+
+    print(f"{args.photos} x {args.width}x{args.height} photos, {args.faces} faces each, gallery {args.gallery_size}")
+    print(f"{'workers':>8} {'scan s':>8} {'match ms':>9} {'commit ms':>10} {'faces':>6} {'students':>9}")
+    for workers in args.workers:
+        photo_attendance = PhotoAttendance(MemoryStorage({"students": students}), workers, upsample=args.upsample)
+        photo_attendance.refresh_gallery()
+        # Start the workers outside the timing
+        photo_attendance.scan([("warmup.jpg", photos[0][1])])
+        try:
+            start = time.perf_counter()
+            found = photo_attendance.scan(photos)
+            scanned = time.perf_counter()
+            matched, _ = photo_attendance.match(found)
+            match_done = time.perf_counter()
+            photo_attendance.commit(matched, "2026-01-01", 1)
+            committed = time.perf_counter()
+        finally:
+            photo_attendance.shutdown()
+        print(f"{workers:>8} {scanned - start:>8.2f} {(match_done - scanned) * 1000:>9.1f} "
+              f"{(committed - match_done) * 1000:>10.1f} {len(found):>6} {len(matched):>9}")
+
+if __name__ == "__main__":
+    main()
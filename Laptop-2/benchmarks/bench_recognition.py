@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+"""
+End-to-end recognition benchmark
+Feeds recorded or synthetic frames through an AttendanceSystem on in-memory storage and reports per-stage latency.
+"""
+
+import os
+import sys
+import glob
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import platform
+import numpy as np
+import cv2
+import face_recognition
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config
+from gallery import ENCODING_DIM
+from encoding_format import encode_encoding
+from pipeline import StageStats
+from tracker import FaceTracker
+from storage import MemoryStorage
+from frame_sources import open_media, IMAGE_EXTENSIONS
+
+UPLOADS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "static", "uploads")
+REPORTED_STAGES = ("resize", "detect", "encode", "match", "recognition", "attendance")
+ALL_DAY = {1: {"start": "00:00", "end": "23:59"}}  # every frame falls inside a lecture
+
+class ReplayCamera:
+    """Frame source with the CameraManager interface, replaying frames held in memory"""
+
+    def __init__(self, frames):
+        self.frames = frames
+        self.position = 0
+
+    def read_frame(self):
+        if self.position >= len(self.frames):
+            return False, None
+        frame = self.frames[self.position]
+        self.position += 1
+        return True, frame
+
+    def release(self):
+        pass
+
+def load_faces(paths):
+    """(student_id, name, BGR image, encoding) for each sample image with exactly one face"""
+    faces = []
+    for path in paths:
+        image = face_recognition.load_image_file(path)
+        encodings = face_recognition.face_encodings(image)
+        if len(encodings) != 1:
+            print(f"skipping {path}: {len(encodings)} faces found")
+            continue
+        name = os.path.splitext(os.path.basename(path))[0]
+        faces.append((f"U{name}", f"Sample {name}", cv2.cvtColor(image, cv2.COLOR_RGB2BGR), encodings[0]))
+    return faces
+
+def gallery_students(faces, size, seed=0):
+    """Student records for the sample faces padded with random encodings up to size"""
+    rng = np.random.default_rng(seed)
+    students = {}
+    for student_id, name, _, encoding in faces:
+        students[student_id] = {"name": name, "face_encoding": encode_encoding(encoding), "updated_at": 1}
+    for i in range(max(0, size - len(faces))):
+        encoding = rng.normal(0, 0.09, ENCODING_DIM)
+        students[f"S{i:06d}"] = {"name": f"Student {i}", "face_encoding": encode_encoding(encoding), "updated_at": 1}
+    return students
+
+def synthetic_background(width, height, rng):
+    """Smooth random colour field, roughly like an out-of-focus classroom"""
+    small = rng.integers(0, 256, (max(2, height // 80), max(2, width // 80), 3), dtype=np.uint8)
+    background = cv2.resize(small, (width, height), interpolation=cv2.INTER_CUBIC)
+    noise = rng.normal(0, 6, background.shape)
+    return np.clip(background + noise, 0, 255).astype(np.uint8)
+
+def composite_frames(faces, count, per_frame, width, height, face_size, scene_length, seed=0):
+    """Sample faces pasted onto backgrounds; layouts drift a little each frame and change every scene_length frames"""
+    rng = np.random.default_rng(seed)
+    frames = []
+    layout = []
+    background = None
+    for frame_id in range(count):
+        if frame_id % scene_length == 0:
+            background = synthetic_background(width, height, rng)
+            layout = []
+            for _ in range(per_frame):
+                face = faces[rng.integers(len(faces))][2]
+                size = int(rng.integers(face_size[0], face_size[1] + 1))
+                patch = cv2.resize(face, (size, size * face.shape[0] // face.shape[1]))
+                top = int(rng.integers(0, max(1, height - patch.shape[0])))
+                left = int(rng.integers(0, max(1, width - patch.shape[1])))
+                layout.append([patch, top, left])
+
+        frame = background.copy()
+        for item in layout:
+            patch, top, left = item
+            # Small drift so the tracker sees moving, not frozen, faces
+            top = int(np.clip(top + rng.integers(-4, 5), 0, height - patch.shape[0]))
+            left = int(np.clip(left + rng.integers(-4, 5), 0, width - patch.shape[1]))
+            item[1:] = top, left
+            frame[top:top + patch.shape[0], left:left + patch.shape[1]] = patch
+        frames.append(frame)
+    return frames
+
+def recorded_frames(source, count):
+    """Frames from a video file, or a directory or glob of images"""
+    media = open_media(source)
+    frames = []
+    while len(frames) < count:
+        ret, frame = media.read_frame()
+        if not ret:
+            break
+        frames.append(frame)
+    media.release()
+    return frames
+
+def run(frames, students, args, workdir):
+    """Recognise every frame once and return the measured stage statistics"""
+    from face_recognition_system import AttendanceSystem
+
+    camera = ReplayCamera(frames)
+    system = AttendanceSystem(
+        db=MemoryStorage({"students": students}),
+        cameras=[{"name": "bench", "room": "bench", "lecture_schedule": ALL_DAY, "camera": camera}],
+        journal_path=os.path.join(workdir, f"journal_{len(students)}.db"),
+        cache_dir=os.path.join(workdir, f"gallery_{len(students)}"),
+        start_threads=False,
+    )
+    feed = system.feeds[0]
+    try:
+        system.load_known_faces()
+        frame_stats = None
+        recognised = detected = writes = 0
+        started = None
+
+        frame_id = 0
+        while True:
+            ret, frame = camera.read_frame()
+            if not ret:
+                break
+            frame_id += 1
+            if frame_id == args.warmup + 1:
+                # Discard warm-up timings (pool start-up, first-call allocations)
+                system.stages = {name: StageStats(name, samples=len(frames)) for name in system.stages}
+                frame_stats = StageStats("frame", samples=len(frames))
+                recognised = detected = writes = 0
+                started = time.perf_counter()
+            if args.no_tracking:
+                feed.tracker = FaceTracker()
+
+            frame_start = time.perf_counter()
+            with system.stages["recognition"].timer():
+                _, names, _ = system.process_frame(frame, feed, frame_id)
+
+            # Attendance writes normally happen on the writer thread; here they are drained inline
+            system.attendance_marked_today.clear()
+            while True:
+                item = system.attendance_queue.get(timeout=0)
+                if item is None:
+                    break
+                with system.stages["attendance"].timer():
+                    writes += system.mark_attendance(*item)
+
+            if frame_stats is not None:
+                frame_stats.record(time.perf_counter() - frame_start)
+            detected += len(names)
+            recognised += sum(name != "Unknown" for name in names)
+
+        measured = frame_stats.count if frame_stats else 0
+        elapsed = time.perf_counter() - started if started else 0.0
+        stages = {}
+        for name in REPORTED_STAGES + ("frame",):
+            stage = frame_stats if name == "frame" else system.stages[name]
+            if stage is None:
+                continue
+            stats = stage.stats()
+            stats.pop("last_ms")
+            stats["avg_ms"] = round(float(np.mean(stage.samples)) * 1000, 2) if stage.samples else 0.0
+            stats.update(stage.percentiles())
+            stages[name] = stats
+        return {
+            "gallery_size": len(students),
+            "frames": measured,
+            "fps": round(measured / elapsed, 2) if elapsed else 0.0,
+            "faces_detected": detected,
+            "faces_recognised": recognised,
+            "attendance_writes": writes,
+            "stages": stages,
+        }
+    finally:
+        if system.encoder_pool:
+            system.encoder_pool.shutdown()
+        system.attendance_journal.close()
+
+def print_result(result):
+    print(f"\ngallery {result['gallery_size']}: {result['frames']} frames, {result['fps']} fps, "
+          f"{result['faces_recognised']}/{result['faces_detected']} faces recognised, "
+          f"{result['attendance_writes']} attendance writes")
+    print(f"{'stage':>12} {'count':>6} {'avg ms':>8} {'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for name, stats in result["stages"].items():
+        print(f"{name:>12} {stats['count']:>6} {stats['avg_ms']:>8.2f} {stats.get('p50_ms', 0):>8.2f} "
+              f"{stats.get('p90_ms', 0):>8.2f} {stats.get('p99_ms', 0):>8.2f} {stats['max_ms']:>8.2f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end recognition benchmark")
+    parser.add_argument("--gallery-sizes", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--frames", type=int, default=100, help="frames measured per gallery size")
+    parser.add_argument("--warmup", type=int, default=5, help="frames run before measuring")
+    parser.add_argument("--source", help="recorded frames: image directory, glob or video file (default: synthetic)")
+    parser.add_argument("--faces", nargs="+", help="sample face images (default: static/uploads)")
+    parser.add_argument("--faces-per-frame", type=int, default=4)
+    parser.add_argument("--face-size", type=int, nargs=2, default=[120, 220], metavar=("MIN", "MAX"),
+                        help="width range in pixels of pasted faces")
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--scene-length", type=int, default=10, help="frames before the synthetic layout changes")
+    parser.add_argument("--scale", type=float, default=config.PROCESSING_SCALE, help="detection downscale")
+    parser.add_argument("--index", choices=["exact", "ivf"], default=config.GALLERY_INDEX)
+    parser.add_argument("--workers", type=int, default=config.RECOGNITION_WORKERS,
+                        help="recognition worker processes (0 runs detection/encoding inline)")
+    parser.add_argument("--no-tracking", action="store_true", help="encode every face in every frame")
+    parser.add_argument("--json", metavar="PATH", help="write machine-readable results to PATH ('-' for stdout)")
+    args = parser.parse_args()
+
+    # The system reads these when it is constructed
+    config.PROCESSING_SCALE = args.scale
+    config.GALLERY_INDEX = args.index
+    config.USE_PROCESS_POOL = args.workers > 0
+    config.RECOGNITION_WORKERS = max(1, args.workers)
+
+    face_paths = args.faces or sorted(
+        p for p in glob.glob(os.path.join(UPLOADS_DIR, "*")) if p.lower().endswith(IMAGE_EXTENSIONS)
+    )
+    faces = load_faces(face_paths)
+    if not faces:
+        sys.exit("No usable sample faces found")
+
+    total = args.frames + args.warmup
+    if args.source:
+        frames = recorded_frames(args.source, total)
+        if not frames:
+            sys.exit(f"No frames could be read from {args.source}")
+    else:
+        frames = composite_frames(faces, total, args.faces_per_frame, args.width, args.height,
+                                  args.face_size, args.scene_length)
+
+    workdir = tempfile.mkdtemp(prefix="bench_recognition_")
+    results = []
+    try:
+        for size in args.gallery_sizes:
+            result = run(frames, gallery_students(faces, size), args, workdir)
+            results.append(result)
+            if args.json != "-":
+                print_result(result)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.json:
+        report = {
+            "benchmark": "recognition",
+            "platform": {"python": platform.python_version(), "machine": platform.machine(), "cpus": os.cpu_count()},
+            "config": {
+                "source": args.source or "synthetic",
+                "frame_size": list(frames[0].shape[1::-1]),
+                "faces_per_frame": None if args.source else args.faces_per_frame,
+                "sample_faces": len(faces),
+                "scale": args.scale,
+                "index": args.index,
+                "workers": args.workers,
+                "tracking": not args.no_tracking,
+                "warmup": args.warmup,
+            },
+            "results": results,
+        }
+        if args.json == "-":
+            json.dump(report, sys.stdout, indent=2)
+            print()
+        else:
+            with open(args.json, "w") as f:
+                json.dump(report, f, indent=2)
+            print(f"\nResults written to {args.json}")
+
+if __name__ == "__main__":
+    main()
@@ -11,26 +11,77 @@ firebase_config = {
     "appId": "1:1001208569305:web:65ce94e8959a3576bbcdc8"
 }
 
+# Storage backend: "firebase", "sqlite" (local file, can be shared with the dashboard) or "memory" (offline runs)
+STORAGE_BACKEND = "firebase"
+STORAGE_SQLITE_PATH = "storage.db"
+
 # Camera Settings
 CAMERA_WIDTH = 640
 CAMERA_HEIGHT = 480
 CAMERA_INDEX = 0  # Change if using external camera
 
+# Cameras handled by this process; "source" is a camera index or a video/stream URL.
+# "room" is recorded with attendance; an optional "lecture_schedule" overrides the default one.
+CAMERAS = [
+    {"name": "main", "source": CAMERA_INDEX, "room": None},
+]
+
 # Motion Detection Settings
 MOTION_THRESHOLD = 5000
 NO_MOTION_TIMEOUT = 30  # seconds
+MOTION_SCALE = 0.25  # Motion is evaluated on a downscaled grayscale copy of the frame
+MOTION_SAMPLE_EVERY = 1  # Evaluate motion every N frames and reuse the result in between
+MOTION_METHOD = "diff"  # "diff" (frame difference) or "mog2" (background subtraction)
+MOTION_MIN_AREA = 100  # Ignore changed areas smaller than this (pixels)
+MOTION_REGION_PADDING = 0.5  # Grow changed areas by this fraction before detecting faces in them
+MOTION_REGION_MIN_SIZE = 120  # Minimum side of a detection crop (pixels)
+MOTION_REGION_MAX_SCALE = 0.5  # Small crops are detected at up to this scale so distant faces stay visible
+FULL_FRAME_DETECT_EVERY = 15  # Run detection on the whole frame every N active frames
 
 # Recognition Settings  
 RECOGNITION_CONFIDENCE_THRESHOLD = 0.6  # 60%
 PROCESSING_SCALE = 0.25  # Scale down for faster processing
+LATENCY_BUDGET_MS = 150  # Target end-to-end recognition latency per frame
+MIN_PROCESSING_SCALE = 0.15  # Lowest scale the scheduler may use when over budget
+MAX_PROCESSING_SCALE = 0.5  # Highest scale used for small or unmatched faces when under budget
+MAX_FRAME_SKIP = 4  # Most frames skipped between processed frames when over budget
+
+# Pipeline Settings
+RECOGNITION_WORKERS = 2  # Workers running detection/encoding, shared by all cameras
+USE_PROCESS_POOL = True  # Run detection/encoding in worker processes to use several CPU cores
+ATTENDANCE_QUEUE_SIZE = 256  # Pending recognitions before recognition waits for the writer
+
+# Attendance Journal Settings
+ATTENDANCE_JOURNAL = "attendance_journal.db"  # Local SQLite journal of records not yet written to Firebase
+ATTENDANCE_FLUSH_INTERVAL = 2  # seconds between flush attempts when idle
+ATTENDANCE_FLUSH_BATCH = 200  # records per multi-path Firebase update
+
+# Gallery Settings
+GALLERY_CACHE_DIR = "gallery_cache"  # Memory-mapped snapshot of known faces for fast startup
+GALLERY_INDEX = "exact"  # "exact" (brute force) or "ivf" (approximate, for galleries of tens of thousands)
+IVF_LISTS = None  # Number of clusters; None = square root of the gallery size
+IVF_PROBES = 8  # Clusters scanned per face; higher = better recall, slower matching
+
+# Group Photo Attendance Settings (photo_attendance.py)
+PHOTO_TILE_SIZE = 1024  # Photos are detected in tiles of this size (pixels), one per worker process
+PHOTO_TILE_OVERLAP = 256  # Overlap between tiles; should exceed the largest face
+PHOTO_UPSAMPLE = 0  # Detector upsampling at full resolution; 1 finds smaller faces at about 4x the cost
+
+# Metrics Settings
+METRICS_HOST = "127.0.0.1"  # "0.0.0.0" lets a Prometheus server on another machine scrape /metrics
+METRICS_PORT = 9108  # Prometheus-style /metrics and profiler toggle; None disables the endpoint
+PROFILER_TOKEN = None  # Bearer token for the /profile endpoints; None disables them
+PROFILER_INTERVAL = 0.005  # seconds between stack samples while the profiler is on
 
 # Lecture Schedule
+# Default timetable for both the recognizer and the dashboard. A "timetable" node in the database (see
+# timetable.py) can replace it and add per-room, per-stream and per-weekday schedules; "festivals" are holidays.
 LECTURE_SCHEDULE = {
-    1: {"start": "08:30", "end": "08:45"},
-    2: {"start": "09:25", "end": "09:40"},
-    3: {"start": "10:20", "end": "10:35"},
-    4: {"start": "11:40", "end": "11:55"},
-    5: {"start": "12:25", "end": "12:40"}
+    1: {"start": "08:30", "end": "09:25"},
+    2: {"start": "09:25", "end": "10:20"},
+    3: {"start": "10:20", "end": "11:15"},
+    4: {"start": "11:40", "end": "12:35"},
+    5: {"start": "12:35", "end": "13:30"}
 }
 
 # Logging Configuration
@@ -0,0 +1,50 @@
+import base64
+import struct
+import numpy as np
+
+# Header: magic, format version, dtype code, dimension
+HEADER = struct.Struct('<2sBBH')
+MAGIC = b'FE'
+VERSION = 1
+
+DTYPES = {
+    "float32": (0, np.float32),
+    "float16": (1, np.float16),
+    "int8": (2, np.int8),
+}
+DTYPE_CODES = {code: (name, dtype) for name, (code, dtype) in DTYPES.items()}
+
+def encode_encoding(encoding, fmt="float32"):
+    """Pack a face encoding into a base64 string (float32, float16 or scaled int8)"""
+    code, dtype = DTYPES[fmt]
+    values = np.asarray(encoding, dtype=np.float32).ravel()
+    payload = HEADER.pack(MAGIC, VERSION, code, values.size)
+
+    if fmt == "int8":
+        scale = float(np.abs(values).max()) / 127 or 1.0
+        payload += struct.pack('<f', scale)
+        payload += np.round(values / scale).astype(np.int8).tobytes()
+    else:
+        payload += values.astype(dtype).tobytes()
+    return base64.b64encode(payload).decode('ascii')
+
+def decode_encoding(stored):
+    """float32 vector from a stored encoding, packed or a legacy JSON list of floats"""
+    if not isinstance(stored, str):
+        return np.asarray(stored, dtype=np.float32)
+
+    payload = base64.b64decode(stored)
+    magic, version, code, dim = HEADER.unpack_from(payload)
+    if magic != MAGIC or version != VERSION or code not in DTYPE_CODES:
+        raise ValueError(f"Unsupported face encoding format (magic={magic!r}, version={version}, dtype={code})")
+
+    name, dtype = DTYPE_CODES[code]
+    offset = HEADER.size
+    if name == "int8":
+        scale, = struct.unpack_from('<f', payload, offset)
+        offset += 4
+        return np.frombuffer(payload, dtype=np.int8, count=dim, offset=offset).astype(np.float32) * scale
+    return np.frombuffer(payload, dtype=dtype, count=dim, offset=offset).astype(np.float32)
+
+def is_packed(stored):
+    return isinstance(stored, str)
@@ -0,0 +1,136 @@
+import os
+import re
+import glob
+import time
+import logging
+from datetime import datetime, timedelta
+import cv2
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+VIDEO_EXTENSIONS = (".mp4", ".avi", ".mkv", ".mov", ".m4v", ".webm")
+# Recording start in file names such as lecture_20261018_083000.mp4 or 2026-10-18T08-30-00.mkv
+FILENAME_TIME = re.compile(r"(\d{4})-?(\d{2})-?(\d{2})[_T -]?(\d{2})[-:.]?(\d{2})[-:.]?(\d{2})")
+
+def parse_start_time(value):
+    """datetime from an ISO-like string ("2026-10-18 08:30" or "2026-10-18T08:30:00")"""
+    return datetime.fromisoformat(value.replace("T", " "))
+
+def media_start_time(path, duration=0.0):
+    """Wall-clock time of the first frame: from the file name, else its modification time minus the duration"""
+    match = FILENAME_TIME.search(os.path.basename(path))
+    if match:
+        try:
+            return datetime(*map(int, match.groups()))
+        except ValueError:
+            pass
+    # Recorders usually close the file when recording stops
+    return datetime.fromtimestamp(os.path.getmtime(path)) - timedelta(seconds=duration)
+
+class VideoFileSource:
+    """Frames of a recorded video, timestamped from start_time plus their position in the file"""
+
+    def __init__(self, path, start_time=None, realtime=False, step=1):
+        self.path = path
+        self.cap = cv2.VideoCapture(path)
+        if not self.cap.isOpened():
+            raise IOError(f"Cannot open video {path}")
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS) or 25.0
+        self.frame_count = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        self.start_time = start_time or media_start_time(path, self.frame_count / self.fps)
+        self.realtime = realtime
+        self.step = max(1, step)
+        self.position = 0  # index of the next frame
+        self.last_timestamp = None
+        self.last_index = None
+        self.started_at = None
+
+    def seek(self, index):
+        self.cap.set(cv2.CAP_PROP_POS_FRAMES, index)
+        self.position = index
+
+    def read_frame(self):
+        for _ in range(self.step - 1):
+            if not self.cap.grab():
+                return False, None
+            self.position += 1
+
+        ret, frame = self.cap.read()
+        if not ret:
+            return False, None
+        self.last_index = self.position
+        self.position += 1
+        offset = self.last_index / self.fps
+        self.last_timestamp = self.start_time + timedelta(seconds=offset)
+
+        if self.realtime:
+            if self.started_at is None:
+                self.started_at = time.perf_counter() - offset
+            delay = self.started_at + offset - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        return True, frame
+
+    def release(self):
+        self.cap.release()
+
+class ImageSequenceSource:
+    """Frames from a directory or glob of images, in file name order"""
+
+    def __init__(self, pattern, start_time=None, fps=1.0, realtime=False, step=1):
+        if os.path.isdir(pattern):
+            pattern = os.path.join(pattern, "*")
+        self.paths = sorted(p for p in glob.glob(pattern) if p.lower().endswith(IMAGE_EXTENSIONS))
+        if not self.paths:
+            raise IOError(f"No images match {pattern}")
+        self.frame_count = len(self.paths)
+        self.start_time = start_time
+        self.fps = fps
+        self.realtime = realtime
+        self.step = max(1, step)
+        self.position = 0
+        self.last_timestamp = None
+        self.last_index = None
+        self.previous_timestamp = None
+
+    def seek(self, index):
+        self.position = index
+
+    def timestamp(self, index):
+        if self.start_time is not None:
+            return self.start_time + timedelta(seconds=index / self.fps)
+        return datetime.fromtimestamp(os.path.getmtime(self.paths[index]))
+
+    def read_frame(self):
+        while self.position < self.frame_count:
+            index = self.position
+            self.position += self.step
+            frame = cv2.imread(self.paths[index])
+            if frame is None:
+                logger.warning(f"Skipping unreadable image {self.paths[index]}")
+                continue
+
+            self.last_index = index
+            self.last_timestamp = self.timestamp(index)
+            if self.realtime and self.previous_timestamp is not None:
+                time.sleep(max(0.0, min(5.0, (self.last_timestamp - self.previous_timestamp).total_seconds())))
+            self.previous_timestamp = self.last_timestamp
+            return True, frame
+        return False, None
+
+    def release(self):
+        pass
+
+def is_media_source(source):
+    """True for a video file, image directory or image glob (as opposed to a camera index or stream URL)"""
+    if not isinstance(source, str) or "://" in source:
+        return False
+    return os.path.isdir(source) or any(ch in source for ch in "*?[") or (
+        os.path.isfile(source) and source.lower().endswith(VIDEO_EXTENSIONS + IMAGE_EXTENSIONS))
+
+def open_media(source, start_time=None, realtime=False, step=1, fps=1.0):
+    """VideoFileSource or ImageSequenceSource for a recorded source"""
+    if os.path.isdir(source) or any(ch in source for ch in "*?[") or source.lower().endswith(IMAGE_EXTENSIONS):
+        return ImageSequenceSource(source, start_time, fps, realtime, step)
+    return VideoFileSource(source, start_time, realtime, step)
@@ -0,0 +1,124 @@
+import numpy as np
+import logging
+
+logger = logging.getLogger(__name__)
+
+ENCODING_DIM = 128
+
+class FaceGallery:
+    """Known face encodings stored as one contiguous float32 matrix"""
+
+    def __init__(self, capacity=1024, dim=ENCODING_DIM):
+        self.dim = dim
+        self.encodings = np.zeros((max(capacity, 1), dim), dtype=np.float32)
+        self.sq_norms = np.zeros(max(capacity, 1), dtype=np.float32)
+        self.ids = []
+        self.names = []
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    @classmethod
+    def from_records(cls, records, dim=ENCODING_DIM):
+        """Build a gallery from (student_id, name, encoding) tuples"""
+        records = list(records)
+        gallery = cls(capacity=len(records), dim=dim)
+        for student_id, name, encoding in records:
+            gallery.add(student_id, name, encoding)
+        return gallery
+
+    @classmethod
+    def from_arrays(cls, encodings, sq_norms, ids, names):
+        """Wrap existing (possibly memory-mapped) arrays without copying them"""
+        gallery = cls.__new__(cls)
+        gallery.dim = encodings.shape[1]
+        gallery.encodings = encodings
+        gallery.sq_norms = sq_norms
+        gallery.ids = list(ids)
+        gallery.names = list(names)
+        gallery.size = len(gallery.ids)
+        return gallery
+
+    def _grow(self):
+        """Double the preallocated capacity"""
+        capacity = len(self.encodings) * 2
+        encodings = np.zeros((capacity, self.dim), dtype=np.float32)
+        sq_norms = np.zeros(capacity, dtype=np.float32)
+        encodings[:self.size] = self.encodings[:self.size]
+        sq_norms[:self.size] = self.sq_norms[:self.size]
+        self.encodings = encodings
+        self.sq_norms = sq_norms
+
+    def add(self, student_id, name, encoding):
+        """Append one encoding to the gallery"""
+        encoding = np.asarray(encoding, dtype=np.float32)
+        if encoding.shape != (self.dim,):
+            logger.warning(f"Skipping encoding for {student_id}: shape {encoding.shape}")
+            return False
+
+        if self.size == len(self.encodings):
+            self._grow()
+
+        row = self.encodings[self.size]
+        row[:] = encoding
+        self.sq_norms[self.size] = np.dot(row, row)
+        self.ids.append(student_id)
+        self.names.append(name)
+        self.size += 1
+        return True
+
+    def freeze(self):
+        """Make the gallery read-only so it can be shared between threads as a snapshot"""
+        self.ids = tuple(self.ids)
+        self.names = tuple(self.names)
+        self.encodings.flags.writeable = False
+        self.sq_norms.flags.writeable = False
+        return self
+
+    @property
+    def matrix(self):
+        """Active rows of the encoding matrix"""
+        return self.encodings[:self.size]
+
+    def distances(self, face_encodings):
+        """Euclidean distances between every face and every gallery entry (M x N)"""
+        return pairwise_distances(face_encodings, self.matrix, self.sq_norms[:self.size])
+
+    def match(self, face_encodings, k=1):
+        """Return the k nearest (student_id, name, distance) candidates for every face"""
+        if len(face_encodings) == 0:
+            return []
+        if self.size == 0:
+            return [[] for _ in range(len(face_encodings))]
+
+        dist = self.distances(face_encodings)
+        rows = top_k(dist, k)
+        return [self.candidates(row_ids, dist[i, row_ids]) for i, row_ids in enumerate(rows)]
+
+    def candidates(self, rows, distances):
+        """(student_id, name, distance) tuples for gallery rows"""
+        return [(self.ids[i], self.names[i], float(d)) for i, d in zip(rows, distances)]
+
+def pairwise_distances(face_encodings, matrix, sq_norms):
+    """Euclidean distances between faces (M x dim) and gallery rows (N x dim)"""
+    faces = np.asarray(face_encodings, dtype=np.float32).reshape(-1, matrix.shape[1])
+    face_sq_norms = np.einsum('ij,ij->i', faces, faces)
+
+    # |a - b|^2 = |a|^2 + |b|^2 - 2ab, computed for all pairs with one matmul
+    sq_dist = faces @ matrix.T
+    sq_dist *= -2
+    sq_dist += face_sq_norms[:, None]
+    sq_dist += sq_norms[None, :]
+    np.maximum(sq_dist, 0, out=sq_dist)
+    return np.sqrt(sq_dist, out=sq_dist)
+
+def top_k(dist, k):
+    """Column indices of the k smallest values in each row, nearest first"""
+    k = min(k, dist.shape[1])
+    if k == 1:
+        return np.argmin(dist, axis=1)[:, None]
+
+    top = np.argpartition(dist, k - 1, axis=1)[:, :k]
+    order = np.take_along_axis(dist, top, axis=1).argsort(axis=1)
+    return np.take_along_axis(top, order, axis=1)
@@ -0,0 +1,159 @@
+import os
+import json
+import glob
+import struct
+import hashlib
+import logging
+from contextlib import contextmanager
+import numpy as np
+from gallery import FaceGallery
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+logger = logging.getLogger(__name__)
+
+CACHE_MAGIC = b'FGAL'
+CACHE_VERSION = 1
+HEADER = struct.Struct('<4sIII')  # magic, version, count, dim
+
+class GalleryCache:
+    """On-disk gallery snapshot that every process memory-maps at startup"""
+
+    def __init__(self, cache_dir, keep=2):
+        self.cache_dir = cache_dir
+        self.index_path = os.path.join(cache_dir, "index.json")
+        self.lock_path = os.path.join(cache_dir, "writer.lock")
+        self.keep = keep  # encodings files kept for processes that have not yet moved on
+
+    def _read_index(self):
+        try:
+            with open(self.index_path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.error(f"Gallery cache index unreadable: {e}")
+            return None
+
+    def load(self):
+        """Map the last saved snapshot; returns (gallery, versions, cursor) or None"""
+        index = self._read_index()
+        if index is None:
+            return None
+        try:
+            gallery = self._map(index)
+        except Exception as e:
+            logger.error(f"Error mapping gallery cache: {e}")
+            return None
+        if gallery is None:
+            return None
+        return gallery, [student[2] for student in index["students"]], index.get("cursor")
+
+    def _map(self, index):
+        """Frozen gallery over the encodings file an index names, or None if they disagree"""
+        students = index["students"]
+        path = os.path.join(self.cache_dir, index["encodings_file"])
+        count = len(students)
+
+        with open(path, 'rb') as f:
+            magic, version, stored_count, dim = HEADER.unpack(f.read(HEADER.size))
+        if magic != CACHE_MAGIC or version != CACHE_VERSION or stored_count != count:
+            logger.error(f"Gallery cache {path} does not match its index")
+            return None
+
+        if count:
+            encodings = np.memmap(path, dtype=np.float32, mode='r',
+                                  offset=HEADER.size, shape=(count, dim))
+            sq_norms = np.memmap(path, dtype=np.float32, mode='r',
+                                 offset=HEADER.size + count * dim * 4, shape=(count,))
+        else:
+            encodings = np.zeros((1, dim), dtype=np.float32)
+            sq_norms = np.zeros(1, dtype=np.float32)
+
+        ids = [student[0] for student in students]
+        names = [student[1] for student in students]
+        return FaceGallery.from_arrays(encodings, sq_norms, ids, names).freeze()
+
+    @staticmethod
+    def digest(gallery, versions):
+        """Content digest of a snapshot; equal galleries get equal encodings file names"""
+        sha = hashlib.sha1(json.dumps([list(gallery.ids), list(gallery.names), list(versions)],
+                                      default=str).encode())
+        sha.update(np.ascontiguousarray(gallery.matrix, dtype='<f4').tobytes())
+        return sha.hexdigest()[:16]
+
+    @contextmanager
+    def _writer_lock(self):
+        """Exclusive lock across processes sharing the cache directory"""
+        with open(self.lock_path, 'a+') as f:
+            if fcntl:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+                else:
+                    f.seek(0)
+                    msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+    def save(self, gallery, versions, cursor):
+        """Publish a snapshot and return it mapped from the cache file"""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        filename = f"encodings.{self.digest(gallery, versions)}.bin"
+        path = os.path.join(self.cache_dir, filename)
+        count = len(gallery)
+        index = {
+            "version": CACHE_VERSION,
+            "encodings_file": filename,
+            "cursor": cursor,
+            "students": [list(student) for student in zip(gallery.ids, gallery.names, versions)],
+        }
+
+        with self._writer_lock():
+            current = self._read_index()
+            if current and current.get("encodings_file") == filename and os.path.exists(path):
+                return self._map(current)
+
+            if not os.path.exists(path):
+                tmp_path = f"{path}.{os.getpid()}.tmp"
+                with open(tmp_path, 'wb') as f:
+                    f.write(HEADER.pack(CACHE_MAGIC, CACHE_VERSION, count, gallery.dim))
+                    f.write(np.ascontiguousarray(gallery.matrix, dtype='<f4').tobytes())
+                    f.write(np.ascontiguousarray(gallery.sq_norms[:count], dtype='<f4').tobytes())
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, path)
+                logger.info(f"Saved gallery cache with {count} faces")
+
+            tmp_index = f"{self.index_path}.{os.getpid()}.tmp"
+            with open(tmp_index, 'w') as f:
+                json.dump(index, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_index, self.index_path)
+            self._remove_old(filename)
+
+        return self._map(index)
+
+    def _remove_old(self, current):
+        """Drop all but the newest encodings files; processes still mapping one keep its pages"""
+        files = sorted(glob.glob(os.path.join(self.cache_dir, "encodings.*.bin")), key=os.path.getmtime, reverse=True)
+        kept = 1
+        for old in files:
+            if os.path.basename(old) == current:
+                continue
+            if kept < self.keep:
+                kept += 1
+                continue
+            try:
+                os.remove(old)
+            except OSError:
+                pass
@@ -0,0 +1,144 @@
+import numpy as np
+import logging
+from gallery import pairwise_distances, top_k
+
+logger = logging.getLogger(__name__)
+
+class BruteForceIndex:
+    """Exact search: scans the whole gallery with one batched distance computation"""
+
+    def __init__(self, gallery):
+        self.gallery = gallery
+
+    def __len__(self):
+        return len(self.gallery)
+
+    def rebuild(self, gallery, changed_ids=()):
+        """Index a new gallery snapshot"""
+        return BruteForceIndex(gallery)
+
+    def match(self, face_encodings, k=1):
+        """Return the k nearest (student_id, name, distance) candidates for every face"""
+        return self.gallery.match(face_encodings, k)
+
+class IVFIndex:
+    """Approximate search that only scans the n_probe nearest k-means clusters"""
+
+    def __init__(self, gallery, n_lists=None, n_probe=8, retrain_factor=2.0,
+                 centroids=None, trained_size=None, assignments=None, changed_ids=()):
+        self.gallery = gallery
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.retrain_factor = retrain_factor
+
+        size = len(gallery)
+        if centroids is None:
+            centroids = self._train(gallery.matrix, self._list_count(size)) if size else None
+            trained_size = size
+            assignments = None
+        self.centroids = centroids
+        self.trained_size = trained_size
+
+        if centroids is not None:
+            self.centroid_sq_norms = np.einsum('ij,ij->i', centroids, centroids)
+            self.assignments = self._assign_rows(assignments or {}, set(changed_ids))
+        else:
+            self.assignments = {}
+
+    def __len__(self):
+        return len(self.gallery)
+
+    def _list_count(self, size):
+        n_lists = self.n_lists or int(np.sqrt(size))
+        return max(1, min(n_lists, size))
+
+    @staticmethod
+    def _train(matrix, n_lists, iterations=10, sample_per_list=64, seed=0):
+        """Lloyd's k-means on a sample of the gallery"""
+        rng = np.random.default_rng(seed)
+        sample_size = min(len(matrix), n_lists * sample_per_list)
+        sample = np.asarray(matrix[rng.choice(len(matrix), sample_size, replace=False)], dtype=np.float32)
+        sample_sq_norms = np.einsum('ij,ij->i', sample, sample)
+        centroids = sample[rng.choice(sample_size, n_lists, replace=False)].copy()
+
+        for _ in range(iterations):
+            nearest = np.argmin(pairwise_distances(centroids, sample, sample_sq_norms).T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, nearest, sample)
+            counts = np.bincount(nearest, minlength=n_lists)
+            filled = counts > 0
+            centroids[filled] = sums[filled] / counts[filled, None]
+
+        return centroids
+
+    def _nearest_centroids(self, encodings, n=1, chunk=16384):
+        """Indices of the n nearest centroids for each row"""
+        results = []
+        for start in range(0, len(encodings), chunk):
+            dist = pairwise_distances(encodings[start:start + chunk], self.centroids, self.centroid_sq_norms)
+            results.append(top_k(dist, n))
+        return np.concatenate(results) if results else np.zeros((0, n), dtype=np.intp)
+
+    def _assign_rows(self, previous, changed_ids):
+        """Cluster of every gallery row, reusing previous assignments by student id"""
+        ids = self.gallery.ids
+        clusters = np.fromiter(
+            (-1 if student_id in changed_ids else previous.get(student_id, -1) for student_id in ids),
+            dtype=np.intp, count=len(ids)
+        )
+        missing = np.flatnonzero(clusters < 0)
+        if len(missing):
+            clusters[missing] = self._nearest_centroids(self.gallery.matrix[missing])[:, 0]
+
+        # Inverted lists are blocks of gallery row numbers sorted by cluster; the matrix itself is not
+        # copied, so a memory-mapped gallery stays shared between processes
+        order = np.argsort(clusters, kind='stable')
+        self.offsets = np.searchsorted(clusters[order], np.arange(len(self.centroids) + 1))
+        self.rows = order
+        return dict(zip(ids, clusters.tolist()))
+
+    def rebuild(self, gallery, changed_ids=()):
+        """Index a new gallery snapshot, keeping trained centroids where possible"""
+        size = len(gallery)
+        stale = (
+            self.centroids is None or size == 0
+            or size > self.trained_size * self.retrain_factor
+            or size * self.retrain_factor < self.trained_size
+        )
+        if stale:
+            logger.info(f"Training IVF index for {size} faces")
+            return IVFIndex(gallery, self.n_lists, self.n_probe, self.retrain_factor)
+
+        return IVFIndex(gallery, self.n_lists, self.n_probe, self.retrain_factor,
+                        centroids=self.centroids, trained_size=self.trained_size,
+                        assignments=self.assignments, changed_ids=changed_ids)
+
+    def match(self, face_encodings, k=1):
+        """Return the k nearest (student_id, name, distance) candidates for every face"""
+        if len(face_encodings) == 0:
+            return []
+        if self.centroids is None:
+            return [[] for _ in range(len(face_encodings))]
+
+        faces = np.asarray(face_encodings, dtype=np.float32).reshape(-1, self.gallery.dim)
+        probes = self._nearest_centroids(faces, min(self.n_probe, len(self.centroids)))
+
+        # Scan the union of every face's probed lists in one pass; extra candidates only help recall
+        blocks = [slice(self.offsets[c], self.offsets[c + 1]) for c in np.unique(probes)]
+        blocks = [b for b in blocks if b.stop > b.start]
+        if not blocks:
+            return [[] for _ in range(len(faces))]
+
+        # Only the probed rows are gathered, a small fraction of the gallery
+        rows = np.sort(np.concatenate([self.rows[b] for b in blocks]))
+        dist = pairwise_distances(faces, self.gallery.matrix[rows], self.gallery.sq_norms[rows])
+        best = top_k(dist, k)
+        return [self.gallery.candidates(rows[b], dist[i, b]) for i, b in enumerate(best)]
+
+def create_index(gallery, kind="exact", n_lists=None, n_probe=8):
+    """Build the gallery index selected in config"""
+    if kind == "exact":
+        return BruteForceIndex(gallery)
+    if kind == "ivf":
+        return IVFIndex(gallery, n_lists=n_lists, n_probe=n_probe)
+    raise ValueError(f"Unknown gallery index type: {kind}")
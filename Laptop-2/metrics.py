@@ -0,0 +1,251 @@
+import sys
+import hmac
+import json
+import time
+import threading
+import logging
+from collections import Counter as _Tally
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pipeline import LATENCY_BUCKETS
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Counter:
+    """Monotonic count, optionally split by label values"""
+
+    def __init__(self, labels=()):
+        self.labelnames = tuple(labels)
+        self.lock = threading.Lock()
+        self.values = {}
+
+    def inc(self, *labels, amount=1):
+        with self.lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def samples(self):
+        with self.lock:
+            return list(self.values.items())
+
+class MetricsRegistry:
+    """Metrics of one process rendered in the Prometheus text format"""
+
+    def __init__(self, prefix):
+        self.prefix = prefix
+        self.families = []  # (name, help, type, collect)
+
+    def counter(self, name, help, labels=()):
+        counter = Counter(labels)
+        self.families.append((name, help, "counter",
+                              lambda: [(counter.labelnames, key, value) for key, value in counter.samples()]))
+        return counter
+
+    def gauge(self, name, help, fn, labels=(), type="gauge"):
+        """fn returns a number, or a dict of label value (tuple) -> number"""
+        def collect():
+            value = fn()
+            if not isinstance(value, dict):
+                return [((), (), value)]
+            return [(tuple(labels), key if isinstance(key, tuple) else (key,), v) for key, v in value.items()]
+        self.families.append((name, help, type, collect))
+
+    def stages(self, name, help, label, fn):
+        """Histograms from a dict of label value -> StageStats returned by fn"""
+        self.families.append((name, help, "histogram", lambda: (label, fn() or {})))
+
+    def render(self):
+        lines = []
+        for name, help, kind, collect in self.families:
+            full_name = f"{self.prefix}_{name}"
+            try:
+                samples = collect()
+            except Exception as e:
+                logger.error(f"Metric {full_name} failed: {e}")
+                continue
+            lines.append(f"# HELP {full_name} {help}")
+            lines.append(f"# TYPE {full_name} {kind}")
+            if kind == "histogram":
+                label, stages = samples
+                for key, stage in stages.items():
+                    self._render_histogram(lines, full_name, label, key, stage)
+            else:
+                for labelnames, values, value in samples:
+                    if value is None:
+                        continue
+                    lines.append(f"{full_name}{_labels(labelnames, values)} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def _render_histogram(lines, full_name, label, key, stage):
+        cumulative, count, total = stage.histogram()
+        for bound, n in zip(LATENCY_BUCKETS + (float("inf"),), cumulative):
+            lines.append(f"{full_name}_bucket{_labels((label,), (key,), [('le', _number(bound))])} {n}")
+        lines.append(f"{full_name}_sum{_labels((label,), (key,))} {_number(total)}")
+        lines.append(f"{full_name}_count{_labels((label,), (key,))} {count}")
+
+class SamplingProfiler:
+    """Statistical profiler that samples the stack of every thread into folded stacks"""
+
+    def __init__(self, interval=0.005, max_depth=64):
+        self.interval = interval
+        self.max_depth = max_depth
+        self.lock = threading.Lock()
+        self.stacks = _Tally()
+        self.samples = 0
+        self.started_at = None
+        self.stopped_at = None
+        self.thread = None
+        self.stop_event = threading.Event()
+
+    @property
+    def running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def start(self, interval=None):
+        """Start sampling from scratch; returns False if already running"""
+        with self.lock:
+            if self.running:
+                return False
+            if interval:
+                self.interval = interval
+            self.stacks = _Tally()
+            self.samples = 0
+            self.started_at = time.time()
+            self.stopped_at = None
+            self.stop_event.clear()
+            self.thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+            self.thread.start()
+        logger.info(f"Sampling profiler started ({self.interval * 1000:.1f} ms interval)")
+        return True
+
+    def stop(self):
+        with self.lock:
+            if not self.running:
+                return False
+            self.stop_event.set()
+            thread = self.thread
+        thread.join()
+        self.stopped_at = time.time()
+        logger.info(f"Sampling profiler stopped after {self.samples} samples")
+        return True
+
+    def _run(self):
+        me = threading.get_ident()
+        while not self.stop_event.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            folded = []
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                stack = []
+                while frame is not None and len(stack) < self.max_depth:
+                    code = frame.f_code
+                    stack.append(f"{frame.f_globals.get('__name__', '?')}:{code.co_name}")
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                folded.append(";".join(reversed(stack)))
+            with self.lock:
+                self.stacks.update(folded)
+                self.samples += 1
+
+    def status(self):
+        with self.lock:
+            return {
+                "running": self.running,
+                "interval_ms": round(self.interval * 1000, 2),
+                "samples": self.samples,
+                "started_at": self.started_at,
+                "stopped_at": self.stopped_at,
+            }
+
+    def folded(self, limit=None):
+        """Folded stacks, most frequent first"""
+        with self.lock:
+            top = self.stacks.most_common(limit)
+        return "".join(f"{stack} {count}\n" for stack, count in top)
+
+class MetricsServer:
+    """Small HTTP server for /metrics and the token-protected /profile endpoints"""
+
+    def __init__(self, registry, profiler, host, port, token=None):
+        self.registry = registry
+        self.profiler = profiler
+        self.token = token
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                path = self.path.split("?", 1)[0]
+                if path == "/metrics":
+                    self._reply(200, server.registry.render(), CONTENT_TYPE)
+                elif path.startswith("/profile") and not self._authorized():
+                    return
+                elif path == "/profile":
+                    self._reply(200, server.profiler.folded(), "text/plain; charset=utf-8")
+                elif path == "/profile/status":
+                    self._reply(200, json.dumps(server.profiler.status()), "application/json")
+                else:
+                    self._reply(404, "not found\n", "text/plain")
+
+            def do_POST(self):
+                path = self.path.split("?", 1)[0]
+                if path.startswith("/profile") and not self._authorized():
+                    return
+                if path == "/profile/start":
+                    server.profiler.start()
+                elif path == "/profile/stop":
+                    server.profiler.stop()
+                else:
+                    return self._reply(404, "not found\n", "text/plain")
+                self._reply(200, json.dumps(server.profiler.status()), "application/json")
+
+            def _authorized(self):
+                """Check the bearer token, replying 404 (no token set) or 401 when it fails"""
+                if not server.token:
+                    self._reply(404, "not found\n", "text/plain")
+                    return False
+                auth = self.headers.get("Authorization", "")
+                supplied = auth[len("Bearer "):].strip() if auth.startswith("Bearer ") else ""
+                if not hmac.compare_digest(supplied.encode(), server.token.encode()):
+                    self._reply(401, "unauthorized\n", "text/plain")
+                    return False
+                return True
+
+            def _reply(self, code, body, content_type):
+                body = body.encode("utf-8")
+                self.send_response(code)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass  # scrapes every few seconds would flood the log
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name="metrics-server", daemon=True)
+
+    def start(self):
+        self.thread.start()
+        host, port = self.httpd.server_address[:2]
+        logger.info(f"Metrics available at http://{host}:{port}/metrics")
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
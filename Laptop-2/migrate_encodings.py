@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Rewrite stored face encodings in the packed format of encoding_format.py
+Changed students get a new updated_at so running recognisers pick them up.
+"""
+
+import json
+import argparse
+import logging
+import config
+from storage import create_storage
+from encoding_format import encode_encoding, decode_encoding, is_packed, DTYPES
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+def student_updates(student_id, record, fmt, repack, keep_photo_data):
+    """Multi-path updates converting one student record"""
+    updates = {}
+    encoding = record.get('face_encoding')
+    if encoding is not None and (repack or not is_packed(encoding)):
+        packed = encode_encoding(decode_encoding(encoding), fmt)
+        if packed != encoding:
+            updates[f"students/{student_id}/face_encoding"] = packed
+    if 'photo_data' in record and not keep_photo_data:
+        updates[f"students/{student_id}/photo_data"] = None
+    if updates:
+        updates[f"students/{student_id}/updated_at"] = {".sv": "timestamp"}
+    return updates
+
+def main():
+    parser = argparse.ArgumentParser(description="Migrate stored face encodings to the packed format")
+    parser.add_argument("--format", choices=sorted(DTYPES), default="float32")
+    parser.add_argument("--repack", action="store_true", help="also convert encodings already packed")
+    parser.add_argument("--keep-photo-data", action="store_true")
+    parser.add_argument("--batch", type=int, default=100, help="students per multi-path update")
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    db = create_storage(config.STORAGE_BACKEND, config.firebase_config, config.STORAGE_SQLITE_PATH)
+    students = db.get("students") or {}
+    if isinstance(students, list):
+        students = {str(idx): record for idx, record in enumerate(students) if record}
+
+    before = after = migrated = 0
+    batch, batch_students = {}, 0
+    for student_id, record in students.items():
+        if not isinstance(record, dict):
+            continue
+        updates = student_updates(student_id, record, args.format, args.repack, args.keep_photo_data)
+        before += len(json.dumps(record))
+        if updates:
+            migrated += 1
+            for path, value in updates.items():
+                field = path.rsplit('/', 1)[1]
+                if value is None:
+                    record.pop(field, None)
+                elif field != 'updated_at':
+                    record[field] = value
+            batch.update(updates)
+            batch_students += 1
+        after += len(json.dumps(record))
+
+        if batch_students >= args.batch and not args.dry_run:
+            db.update(batch)
+            batch, batch_students = {}, 0
+
+    if batch and not args.dry_run:
+        db.update(batch)
+
+    logger.info(f"{migrated} of {len(students)} students {'would be ' if args.dry_run else ''}migrated to {args.format}; "
+                f"students node {before / 1024:.1f} KB -> {after / 1024:.1f} KB")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+Attendance from group photos of a classroom
+Photos are tiled across worker processes, matched in one pass and written in a single update.
+"""
+
+import io
+import os
+import argparse
+import logging
+import threading
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import face_recognition
+from PIL import Image, ImageOps
+import config
+from attendance_journal import generate_push_key
+from frame_sources import IMAGE_EXTENSIONS
+from gallery_index import create_index
+from regions import overlaps, box_area
+from storage import create_storage, iter_node
+from sync import GallerySync
+
+logger = logging.getLogger(__name__)
+
+def load_photo(photo):
+    """RGB array of a photo (path or bytes), upright according to its EXIF orientation"""
+    image = Image.open(io.BytesIO(photo) if isinstance(photo, bytes) else photo)
+    return np.array(ImageOps.exif_transpose(image).convert("RGB"))
+
+def tiles(shape, tile_size, overlap):
+    """(top, right, bottom, left) tiles covering an image; neighbours share overlap pixels"""
+    height, width = shape[:2]
+    stride = max(1, tile_size - overlap)
+    rows = range(0, max(1, height - overlap), stride)
+    cols = range(0, max(1, width - overlap), stride)
+    return [(top, min(width, left + tile_size), min(height, top + tile_size), left) for top in rows for left in cols]
+
+def scan_tile(image, upsample):
+    """Face boxes and encodings in one tile; runs in a worker process"""
+    locations = face_recognition.face_locations(image, number_of_times_to_upsample=upsample)
+    if not locations:
+        return [], []
+    return locations, face_recognition.face_encodings(image, locations)
+
+def merge_detections(detections, shape):
+    """One detection per face from overlapping tiles, preferring boxes clear of tile edges"""
+    def cut(detection):
+        (top, right, bottom, left), tile = detection[0], detection[2]
+        return ((top <= tile[0] + 1 and tile[0] > 0) or (left <= tile[3] + 1 and tile[3] > 0)
+                or (bottom >= tile[2] - 1 and tile[2] < shape[0]) or (right >= tile[1] - 1 and tile[1] < shape[1]))
+
+    kept = []
+    for detection in sorted(detections, key=lambda d: (cut(d), -box_area(d[0]))):
+        box = detection[0]
+        if not any(overlaps(box, other[0]) and _overlap_ratio(box, other[0]) > 0.3 for other in kept):
+            kept.append(detection)
+    return kept
+
+def _overlap_ratio(a, b):
+    """Intersection over the smaller box"""
+    height = min(a[2], b[2]) - max(a[0], b[0])
+    width = min(a[1], b[1]) - max(a[3], b[3])
+    return max(0, height) * max(0, width) / max(1, min(box_area(a), box_area(b)))
+
+class PhotoAttendance:
+    """Recognises students in group photos and records their attendance"""
+
+    def __init__(self, db, workers=None, tile_size=1024, overlap=256, upsample=0, tolerance=0.6):
+        self.db = db
+        self.workers = workers or os.cpu_count()
+        self.tile_size = tile_size
+        self.overlap = overlap
+        self.upsample = upsample
+        self.tolerance = tolerance
+        self.gallery_sync = GallerySync(db)
+        self.index = None
+        self.pool = None
+        self.lock = threading.Lock()
+
+    def refresh_gallery(self):
+        gallery = self.gallery_sync.poll()
+        if gallery is not None:
+            self.index = create_index(gallery, config.GALLERY_INDEX, config.IVF_LISTS, config.IVF_PROBES)
+        return self.index
+
+    def scan(self, photos):
+        """Faces in every photo as (photo name, box, encoding); photos is a list of (name, path or bytes)"""
+        with self.lock:
+            if self.pool is None:
+                self.pool = ProcessPoolExecutor(self.workers)
+
+        # Submit every tile of every photo before waiting on any, so all cores stay busy
+        submitted = []
+        for number, (_, photo) in enumerate(photos):
+            image = load_photo(photo)
+            for tile in tiles(image.shape, self.tile_size, self.overlap):
+                top, right, bottom, left = tile
+                future = self.pool.submit(scan_tile, np.ascontiguousarray(image[top:bottom, left:right]), self.upsample)
+                submitted.append((number, image.shape, tile, future))
+
+        # Keyed by position, not name: uploads may share a file name
+        detections = {}
+        for number, shape, tile, future in submitted:
+            locations, encodings = future.result()
+            for (t, r, b, l), encoding in zip(locations, encodings):
+                box = (t + tile[0], r + tile[3], b + tile[0], l + tile[3])
+                detections.setdefault(number, (shape, []))[1].append((box, encoding, tile))
+
+        faces = []
+        for number, (shape, found) in sorted(detections.items()):
+            name = photos[number][0]
+            faces.extend((name, box, encoding) for box, encoding, _ in merge_detections(found, shape))
+        return faces
+
+    def match(self, faces):
+        """Best candidate per student over all photos, plus faces left unmatched"""
+        with self.lock:
+            index = self.refresh_gallery()
+        if index is None or not faces:
+            return {}, [(name, box) for name, box, _ in faces]
+
+        matched, unknown = {}, []
+        for (name, box, _), candidates in zip(faces, index.match([encoding for _, _, encoding in faces])):
+            if not candidates or candidates[0][2] > self.tolerance:
+                unknown.append((name, box))
+                continue
+            student_id, student_name, distance = candidates[0]
+            confidence = 1 - distance
+            if student_id not in matched or confidence > matched[student_id]["confidence"]:
+                matched[student_id] = {"student_name": student_name, "confidence": confidence, "photo": name, "box": box}
+        return matched, unknown
+
+    def commit(self, matched, date, lecture, room=None, dry_run=False):
+        """Write attendance for every matched student not already marked, in one update; returns their ids"""
+        existing = dict(iter_node(self.db.get(f"attendance/{date}")))
+        now = datetime.now().isoformat()
+        updates = {}
+        marked = []
+        for student_id, match in sorted(matched.items()):
+            if f"lecture{lecture}" in (existing.get(student_id) or {}):
+                continue
+            record = {
+                "student_id": student_id,
+                "student_name": match["student_name"],
+                "date": date,
+                "lecture": lecture,
+                "time": now,
+                "confidence": float(match["confidence"]),
+                "status": "Present",
+                "source": "photo",
+            }
+            if room:
+                record["room"] = room
+            updates[f"attendance/{date}/{student_id}/lecture{lecture}"] = "Present"
+            updates[f"attendance_logs/{generate_push_key()}"] = record
+            marked.append(student_id)
+        if updates and not dry_run:
+            self.db.update(updates)
+        return marked
+
+    def run(self, photos, date, lecture, room=None, dry_run=False):
+        """Scan, match and commit; returns a report of the whole batch"""
+        faces = self.scan(photos)
+        matched, unknown = self.match(faces)
+        marked = self.commit(matched, date, lecture, room, dry_run)
+        logger.info(f"{len(faces)} faces in {len(photos)} photos: {len(matched)} students recognised, "
+                    f"{len(marked)} {'to be ' if dry_run else ''}newly marked for lecture {lecture} on {date}")
+        return {
+            "faces": len(faces),
+            "recognised": [
+                {"student_id": student_id, "student_name": m["student_name"], "confidence": round(m["confidence"], 3),
+                 "photo": m["photo"], "box": list(m["box"])}
+                for student_id, m in sorted(matched.items())
+            ],
+            "unknown": [{"photo": name, "box": list(box)} for name, box in unknown],
+            "marked": marked,
+        }
+
+    def shutdown(self):
+        if self.pool:
+            self.pool.shutdown()
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Mark attendance from classroom group photos")
+    parser.add_argument("photos", nargs="+", help="photo files or directories of photos")
+    parser.add_argument("--date", default=datetime.now().strftime("%Y-%m-%d"), help="YYYY-MM-DD (default: today)")
+    parser.add_argument("--lecture", type=int, required=True)
+    parser.add_argument("--room")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--upsample", type=int, default=config.PHOTO_UPSAMPLE,
+                        help="detector upsampling; 1 finds faces down to ~40 px at about 4x the cost")
+    parser.add_argument("--dry-run", action="store_true", help="report matches without writing attendance")
+    args = parser.parse_args()
+
+    paths = []
+    for path in args.photos:
+        if os.path.isdir(path):
+            paths += sorted(os.path.join(path, p) for p in os.listdir(path) if p.lower().endswith(IMAGE_EXTENSIONS))
+        else:
+            paths.append(path)
+
+    db = create_storage(config.STORAGE_BACKEND, config.firebase_config, config.STORAGE_SQLITE_PATH)
+    photo_attendance = PhotoAttendance(db, args.workers, config.PHOTO_TILE_SIZE, config.PHOTO_TILE_OVERLAP, args.upsample)
+    try:
+        report = photo_attendance.run([(os.path.basename(p), p) for p in paths], args.date, args.lecture,
+                                      args.room, args.dry_run)
+    finally:
+        photo_attendance.shutdown()
+
+    for student in report["recognised"]:
+        if student["student_id"] not in report["marked"]:
+            status = "already marked"
+        else:
+            status = "would mark" if args.dry_run else "marked"
+        print(f"{student['student_id']:>12}  {student['student_name']:<30} {student['confidence']:.2f}  {status}")
+    print(f"{len(report['unknown'])} unrecognised faces")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+import threading
+import time
+from bisect import bisect_left
+from collections import deque
+import numpy as np
+
+# Upper bounds in seconds of the latency histogram kept by every StageStats
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+class DropOldestQueue:
+    """Bounded queue that discards the oldest item when a new one arrives and it is full"""
+
+    def __init__(self, name, maxsize=1):
+        self.name = name
+        self.maxsize = maxsize
+        self.items = deque()
+        self.condition = threading.Condition()
+        self.put_count = 0
+        self.dropped = 0
+
+    def __len__(self):
+        return len(self.items)
+
+    def put(self, item):
+        """Add an item, dropping the oldest one if the queue is full"""
+        with self.condition:
+            if len(self.items) >= self.maxsize:
+                self.items.popleft()
+                self.dropped += 1
+            self.items.append(item)
+            self.put_count += 1
+            self.condition.notify()
+
+    def get(self, timeout=None):
+        """Remove and return the oldest item, or None if nothing arrived within timeout"""
+        with self.condition:
+            if not self.items:
+                self.condition.wait(timeout)
+            if not self.items:
+                return None
+            return self.items.popleft()
+
+    def stats(self):
+        return {
+            "depth": len(self.items),
+            "maxsize": self.maxsize,
+            "put": self.put_count,
+            "dropped": self.dropped,
+        }
+
+class BlockingQueue(DropOldestQueue):
+    """Bounded queue whose put waits for room instead of dropping anything"""
+
+    def put(self, item):
+        with self.condition:
+            while len(self.items) >= self.maxsize:
+                self.condition.wait()
+            self.items.append(item)
+            self.put_count += 1
+            self.condition.notify_all()
+
+    def get(self, timeout=None):
+        with self.condition:
+            item = super().get(timeout)
+            # Wake producers waiting for room
+            self.condition.notify_all()
+            return item
+
+class StageStats:
+    """Processed count, latency buckets and optional recent samples of one pipeline stage"""
+
+    def __init__(self, name, smoothing=0.1, samples=0):
+        self.name = name
+        self.smoothing = smoothing
+        self.lock = threading.Lock()
+        self.count = 0
+        self.last = 0.0
+        self.average = 0.0
+        self.max = 0.0
+        self.total = 0.0
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)  # last bucket is +Inf
+        self.samples = deque(maxlen=samples) if samples else None
+
+    def record(self, seconds):
+        with self.lock:
+            self.count += 1
+            self.last = seconds
+            # Exponential moving average so the figure tracks current load
+            self.average = seconds if self.count == 1 else self.average + self.smoothing * (seconds - self.average)
+            self.max = max(self.max, seconds)
+            self.total += seconds
+            self.buckets[bisect_left(LATENCY_BUCKETS, seconds)] += 1
+            if self.samples is not None:
+                self.samples.append(seconds)
+
+    def percentiles(self, quantiles=(50, 90, 99)):
+        """Latency percentiles in ms over the kept samples"""
+        with self.lock:
+            samples = list(self.samples or ())
+        if not samples:
+            return {}
+        values = np.percentile(samples, quantiles) * 1000
+        return {f"p{q}_ms": round(float(v), 2) for q, v in zip(quantiles, values)}
+
+    def histogram(self):
+        """(cumulative bucket counts, count, total seconds) in Prometheus histogram form"""
+        with self.lock:
+            buckets = list(self.buckets)
+            count, total = self.count, self.total
+        cumulative = []
+        running = 0
+        for n in buckets:
+            running += n
+            cumulative.append(running)
+        return cumulative, count, total
+
+    def timer(self):
+        """Context manager that records the duration of its block"""
+        return _StageTimer(self)
+
+    def stats(self):
+        with self.lock:
+            return {
+                "count": self.count,
+                "last_ms": round(self.last * 1000, 2),
+                "avg_ms": round(self.average * 1000, 2),
+                "max_ms": round(self.max * 1000, 2),
+            }
+
+class _StageTimer:
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.stage.record(time.perf_counter() - self.start)
+        return False
+
+class RoundRobinScheduler:
+    """Newest pending frame per source, handed out in rotation"""
+
+    def __init__(self, name):
+        self.name = name
+        self.sources = []
+        self.slots = {}
+        self.dropped = {}
+        self.next_index = 0
+        self.condition = threading.Condition()
+        self.put_count = 0
+
+    def add_source(self, source):
+        with self.condition:
+            self.sources.append(source)
+            self.dropped[source] = 0
+
+    def put(self, source, item):
+        with self.condition:
+            if source in self.slots:
+                self.dropped[source] += 1
+            self.slots[source] = item
+            self.put_count += 1
+            self.condition.notify()
+
+    def get(self, timeout=None):
+        """Return (source, item) for the next source in rotation that has a frame, or None"""
+        with self.condition:
+            if not self.slots:
+                self.condition.wait(timeout)
+            if not self.slots:
+                return None
+
+            for offset in range(len(self.sources)):
+                index = (self.next_index + offset) % len(self.sources)
+                source = self.sources[index]
+                if source in self.slots:
+                    self.next_index = index + 1
+                    return source, self.slots.pop(source)
+            return None
+
+    def stats(self):
+        with self.condition:
+            return {
+                "depth": len(self.slots),
+                "maxsize": len(self.sources),
+                "put": self.put_count,
+                "dropped": sum(self.dropped.values()),
+            }
+
+class AdaptiveScheduler:
+    """Adjusts detection scale and frame skipping to hold a latency budget"""
+
+    def __init__(self, budget, base_scale, min_scale, max_scale, max_skip,
+                 small_face=40, step=1.25, smoothing=0.3):
+        self.budget = budget
+        self.base_scale = base_scale
+        self.min_scale = min_scale
+        self.max_scale = max_scale
+        self.max_skip = max_skip
+        self.small_face = small_face
+        self.step = step
+        self.smoothing = smoothing
+        self.scale = base_scale
+        self.skip = 0
+        self.latency = None
+        self.lock = threading.Lock()
+
+    def should_process(self, frame_id):
+        """Whether this frame should be sent for recognition"""
+        return frame_id % (self.skip + 1) == 0
+
+    def needs_detail(self, face_locations, face_names):
+        """Faces too small at the current scale, or not recognised"""
+        for (top, _, bottom, _), name in zip(face_locations, face_names):
+            if name == "Unknown" or (bottom - top) * self.scale < self.small_face:
+                return True
+        return False
+
+    def record(self, latency, face_locations=(), face_names=()):
+        """Feed back the end-to-end latency and results of one frame"""
+        with self.lock:
+            self.latency = latency if self.latency is None else self.latency + self.smoothing * (latency - self.latency)
+
+            if self.latency > self.budget:
+                if self.scale > self.min_scale:
+                    self.scale = max(self.min_scale, self.scale / self.step)
+                elif self.skip < self.max_skip:
+                    self.skip += 1
+            elif self.latency < 0.6 * self.budget:
+                if self.skip > 0:
+                    self.skip -= 1
+                elif self.needs_detail(face_locations, face_names):
+                    self.scale = min(self.max_scale, self.scale * self.step)
+                elif self.scale > self.base_scale:
+                    self.scale = max(self.base_scale, self.scale / self.step)
+                elif self.scale < self.base_scale:
+                    self.scale = min(self.base_scale, self.scale * self.step)
+
+    def stats(self):
+        with self.lock:
+            return {
+                "scale": round(self.scale, 3),
+                "skip": self.skip,
+                "latency_ms": round((self.latency or 0) * 1000, 2),
+            }
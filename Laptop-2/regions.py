@@ -0,0 +1,42 @@
+import math
+
+def pad_box(box, padding, min_size, frame_shape):
+    """Grow a (top, right, bottom, left) box by padding (a fraction of its size), clamped to the frame"""
+    top, right, bottom, left = box
+    height, width = frame_shape[:2]
+    pad_y = max(int((bottom - top) * padding), (min_size - (bottom - top)) // 2, 0)
+    pad_x = max(int((right - left) * padding), (min_size - (right - left)) // 2, 0)
+    return (max(0, top - pad_y), min(width, right + pad_x), min(height, bottom + pad_y), max(0, left - pad_x))
+
+def overlaps(a, b):
+    return a[0] < b[2] and b[0] < a[2] and a[3] < b[1] and b[3] < a[1]
+
+def merge_boxes(boxes):
+    """Union overlapping boxes until none overlap"""
+    boxes = list(boxes)
+    merged = True
+    while merged:
+        merged = False
+        result = []
+        while boxes:
+            box = boxes.pop()
+            for i, other in enumerate(result):
+                if overlaps(box, other):
+                    result[i] = (min(box[0], other[0]), max(box[1], other[1]),
+                                 max(box[2], other[2]), min(box[3], other[3]))
+                    merged = True
+                    break
+            else:
+                result.append(box)
+        boxes = result
+    return boxes
+
+def box_area(box):
+    return (box[2] - box[0]) * (box[1] - box[3])
+
+def detection_scale(regions, frame_shape, base_scale, max_scale, budget=0.5):
+    """Crop scale that keeps detection within budget x the whole frame at base_scale"""
+    frame_area = frame_shape[0] * frame_shape[1]
+    total_area = max(sum(box_area(region) for region in regions), 1)
+    scale = base_scale * math.sqrt(budget * frame_area / total_area)
+    return max(base_scale, min(max_scale, scale))
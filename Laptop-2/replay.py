@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Reprocess a recorded lecture (video file or image sequence) for attendance
+Attendance is marked with the time each frame was recorded.
+"""
+
+import os
+import time
+import argparse
+import logging
+import tempfile
+from datetime import timedelta
+from concurrent.futures import ProcessPoolExecutor
+import cv2
+import face_recognition
+import config
+from frame_sources import open_media, parse_start_time
+from storage import iter_node
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+REPLAY_JOURNAL = "replay_journal.db"  # separate from config.ATTENDANCE_JOURNAL, which the recognizer owns
+
+def scan_segment(source, start_time, fps, first, last, step, scale):
+    """(frame index, timestamp, encodings) for frames with faces in [first, last); runs in a worker process"""
+    media = open_media(source, start_time, step=step, fps=fps)
+    media.seek(first)
+    results = []
+    try:
+        while media.position < last:
+            ret, frame = media.read_frame()
+            if not ret or media.last_index >= last:
+                break
+            small = cv2.cvtColor(cv2.resize(frame, (0, 0), fx=scale, fy=scale), cv2.COLOR_BGR2RGB)
+            locations = face_recognition.face_locations(small)
+            if locations:
+                results.append((media.last_index, media.last_timestamp, face_recognition.face_encodings(small, locations)))
+    finally:
+        media.release()
+    return results
+
+def segments(frame_count, segment_frames, step):
+    """[first, last) frame ranges; boundaries fall on multiples of step so sampling stays even"""
+    segment_frames = max(step, segment_frames - segment_frames % step)
+    return [(first, min(first + segment_frames, frame_count)) for first in range(0, frame_count, segment_frames)]
+
+def preload_marked(system, start, end):
+    """Add attendance already in Firebase for the recording's dates, so it is not written again"""
+    if not system.db:
+        return
+    day = start.date()
+    while day <= end.date():
+        date = day.strftime("%Y-%m-%d")
+        for student_id, lectures in iter_node(system.db.get(f"attendance/{date}")):
+            for lecture, _ in iter_node(lectures):
+                system.attendance_marked_today.add(f"{student_id}_{date}_{lecture.replace('lecture', '')}")
+        day += timedelta(days=1)
+
+def replay(args, journal_path):
+    """Scan the recording and mark attendance through a journal at journal_path"""
+    # The recognizer's own pool is not used; replay runs its own workers
+    config.USE_PROCESS_POOL = False
+    from face_recognition_system import AttendanceSystem
+
+    start_time = parse_start_time(args.start) if args.start else None
+    media = open_media(args.source, start_time, fps=args.fps)
+    fps, frame_count = media.fps, media.frame_count
+    first_timestamp = media.start_time or media.timestamp(0)
+    last_timestamp = first_timestamp + timedelta(seconds=frame_count / fps) if media.start_time else media.timestamp(frame_count - 1)
+    step = max(1, round(fps / args.sample_fps))
+
+    camera = next((c for c in config.CAMERAS if c["name"] == args.camera), {}) if args.camera else {}
+    system = AttendanceSystem(
+        cameras=[{"name": f"replay:{os.path.basename(args.source)}", "room": args.room or camera.get("room"),
+                  "lecture_schedule": camera.get("lecture_schedule"), "camera": media}],
+        journal_path=journal_path, start_threads=False,
+    )
+    feed = system.feeds[0]
+    system.refresh_known_faces()
+    system.refresh_timetable()
+    if not len(system.gallery):
+        logger.error("No known faces - nothing to match against")
+        system.attendance_journal.close()
+        return
+    preload_marked(system, first_timestamp, last_timestamp)
+
+    work = segments(frame_count, int(args.segment_seconds * fps), step)
+    logger.info(f"Replaying {frame_count} frames ({frame_count / fps / 60:.1f} min from {first_timestamp}) "
+                f"every {step} frames in {len(work)} segments on {args.workers} workers")
+
+    started = time.perf_counter()
+    frames_with_faces = faces = marked = 0
+    with ProcessPoolExecutor(args.workers) as pool:
+        futures = [pool.submit(scan_segment, args.source, start_time, args.fps, first, last, step, args.scale)
+                   for first, last in work]
+        # Segments are consumed in recording order so the earliest sighting sets the attendance time
+        for future in futures:
+            for index, timestamp, encodings in future.result():
+                frames_with_faces += 1
+                faces += len(encodings)
+                for candidates in system.index.match(encodings):
+                    if not candidates:
+                        continue
+                    student_id, name, distance = candidates[0]
+                    confidence = 1 - distance
+                    if distance <= system.match_tolerance and confidence > 0.1:
+                        marked += system.mark_attendance(student_id, name, confidence, feed, timestamp)
+
+    elapsed = time.perf_counter() - started
+    logger.info(f"Analysed {len(range(0, frame_count, step))} frames in {elapsed:.1f}s "
+                f"({frame_count / fps / max(elapsed, 1e-9):.1f}x realtime): {faces} faces in {frames_with_faces} frames, "
+                f"{marked} attendance records")
+
+    if args.dry_run:
+        for _, _, record in system.attendance_journal.pending_records():
+            logger.info(f"Would mark {record['student_name']} ({record['student_id']}) "
+                        f"lecture {record['lecture']} on {record['date']} at {record['time']}")
+    else:
+        while system.attendance_journal.flush(system.db) == system.attendance_journal.batch_size:
+            pass
+        logger.info(f"{system.attendance_journal.pending_count()} records left in {journal_path}; "
+                    f"the next replay delivers them")
+    system.attendance_journal.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Mark attendance from a recorded lecture")
+    parser.add_argument("source", help="video file, image directory or image glob")
+    parser.add_argument("--start", help="wall-clock time of the first frame, e.g. '2026-10-18 08:30' "
+                                        "(default: from the file name, else the file's modification time)")
+    parser.add_argument("--fps", type=float, default=1.0, help="frame rate of an image sequence")
+    parser.add_argument("--sample-fps", type=float, default=2.0, help="frames analysed per second of recording")
+    parser.add_argument("--camera", help="camera in config.CAMERAS whose room and lecture schedule apply")
+    parser.add_argument("--room", help="room recorded in attendance (overrides --camera)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="decoding/recognition processes")
+    parser.add_argument("--segment-seconds", type=float, default=60, help="recording length per work item")
+    parser.add_argument("--scale", type=float, default=config.PROCESSING_SCALE, help="detection downscale")
+    parser.add_argument("--journal", default=REPLAY_JOURNAL,
+                        help="journal for records not yet written; kept apart from the running recognizer's")
+    parser.add_argument("--dry-run", action="store_true", help="report who would be marked without writing")
+    args = parser.parse_args()
+
+    if args.dry_run:
+        # Records only go to a throwaway journal that is listed and then deleted
+        with tempfile.TemporaryDirectory(prefix="replay_") as directory:
+            replay(args, os.path.join(directory, "journal.db"))
+    else:
+        replay(args, args.journal)
+
+if __name__ == "__main__":
+    main()
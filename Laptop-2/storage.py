@@ -0,0 +1,419 @@
+import abc
+import copy
+import json
+import os
+import sqlite3
+import threading
+import time
+import logging
+from pipeline import StageStats
+from attendance_journal import generate_push_key
+
+logger = logging.getLogger(__name__)
+
+KEY = "$key"  # order_by value that orders children by key
+
+def split_path(path):
+    return [segment for segment in str(path).split("/") if segment]
+
+def server_timestamp():
+    return int(time.time() * 1000)
+
+def resolve_server_values(value):
+    """Replace {".sv": "timestamp"} placeholders the way Firebase does on write"""
+    if isinstance(value, dict):
+        if value == {".sv": "timestamp"}:
+            return server_timestamp()
+        return {key: resolve_server_values(child) for key, child in value.items()}
+    if isinstance(value, list):
+        return [resolve_server_values(child) for child in value]
+    return value
+
+def apply_query(value, shallow=False, order_by=None, start_at=None, limit_to_last=None):
+    """Ordered, filtered and shallow views of a node, as returned by Firebase"""
+    if not isinstance(value, dict):
+        return value
+
+    if order_by is not None:
+        if order_by == KEY:
+            items = sorted(value.items())
+            if start_at is not None:
+                items = [(key, child) for key, child in items if key >= str(start_at)]
+        else:
+            items = [(key, child) for key, child in value.items()
+                     if isinstance(child, dict) and child.get(order_by) is not None]
+            if start_at is not None:
+                items = [(key, child) for key, child in items
+                         if type(child[order_by]) is type(start_at) or
+                         (isinstance(child[order_by], (int, float)) and isinstance(start_at, (int, float)))]
+                items = [(key, child) for key, child in items if child[order_by] >= start_at]
+            items.sort(key=lambda item: (item[1][order_by], item[0]))
+        if limit_to_last is not None:
+            items = items[-limit_to_last:] if limit_to_last else []
+        value = dict(items)
+
+    if shallow:
+        return {key: True for key in value}
+    return value
+
+def set_in(tree, segments, value):
+    """Set (or with None, delete) the node at segments inside a nested dict; returns the new tree"""
+    if not segments:
+        return value
+    tree = dict(tree) if isinstance(tree, dict) else {}
+    child = set_in(tree.get(segments[0]), segments[1:], value)
+    if child is None or child == {}:
+        tree.pop(segments[0], None)
+    else:
+        tree[segments[0]] = child
+    return tree or None
+
+def iter_node(data):
+    """Yield (key, value) for a node Firebase returned as a dict, or as a list when its keys are numbers"""
+    if isinstance(data, dict):
+        for key, value in data.items():
+            yield str(key), value
+    elif isinstance(data, list):
+        for idx, value in enumerate(data):
+            if value is not None:
+                yield str(idx), value
+
+def get_in(tree, segments):
+    for segment in segments:
+        if not isinstance(tree, dict):
+            return None
+        tree = tree.get(segment)
+    return tree
+
+class Storage(abc.ABC):
+    """Path-based database interface shared by the dashboard and the recognizer"""
+
+    name = "storage"
+
+    def __init__(self):
+        self.op_stats = {op: StageStats(op) for op in ("get", "set", "push", "update", "remove")}
+
+    def get(self, path, shallow=False, order_by=None, start_at=None, limit_to_last=None):
+        """Value at path; order_by is a child name or KEY"""
+        with self.op_stats["get"].timer():
+            return self._get(path, shallow, order_by, start_at, limit_to_last)
+
+    def set(self, path, value):
+        with self.op_stats["set"].timer():
+            self._set(path, value)
+
+    def push(self, path, value):
+        """Append under a new chronologically ordered key; returns the key"""
+        key = generate_push_key()
+        with self.op_stats["push"].timer():
+            self._set(f"{path}/{key}", value)
+        return key
+
+    def update(self, updates):
+        with self.op_stats["update"].timer():
+            self._update(updates)
+
+    def remove(self, path):
+        with self.op_stats["remove"].timer():
+            self._set(path, None)
+
+    @abc.abstractmethod
+    def subscribe(self, path, callback, order_by=None, limit_to_last=None):
+        """Call callback({"event", "path", "data"}) on every change; returns a handle with close()"""
+
+    @abc.abstractmethod
+    def _get(self, path, shallow, order_by, start_at, limit_to_last):
+        """Backend read behind get()"""
+
+    @abc.abstractmethod
+    def _set(self, path, value):
+        """Backend write (None deletes) behind set(), push() and remove()"""
+
+    @abc.abstractmethod
+    def _update(self, updates):
+        """Backend multi-path write behind update()"""
+
+    def _affected(self, updates):
+        """Subscriptions whose node may have changed by these updates"""
+        paths = [split_path(path) for path in updates]
+        return [subscription for subscription in self.subscriptions
+                if any(subscription.affected_by(segments) for segments in paths)]
+
+    def _unsubscribe(self, subscription):
+        with self.lock:
+            if subscription in self.subscriptions:
+                self.subscriptions.remove(subscription)
+
+    def stats(self):
+        return {"backend": self.name, "operations": {op: stage.stats() for op, stage in self.op_stats.items()}}
+
+    def close(self):
+        pass
+
+class FirebaseStorage(Storage):
+    """Firebase Realtime Database through pyrebase, over one pooled HTTP session"""
+
+    name = "firebase"
+
+    def __init__(self, firebase_config, pool_size=16):
+        super().__init__()
+        import pyrebase
+        from requests.adapters import HTTPAdapter
+
+        self.firebase = pyrebase.initialize_app(firebase_config)
+        # Every request of this process goes through this session; size its connection pool for our threads
+        self.firebase.requests.mount("https://", HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size,
+                                                             max_retries=3))
+
+    def _query(self, path, order_by=None, start_at=None, limit_to_last=None):
+        # pyrebase's child()/order_by_*() mutate the Database object, so each query gets its own;
+        # they all share the pooled session
+        query = self.firebase.database()
+        for segment in split_path(path):
+            query = query.child(segment)
+        if order_by == KEY:
+            query = query.order_by_key()
+        elif order_by is not None:
+            query = query.order_by_child(order_by)
+        if start_at is not None:
+            query = query.start_at(start_at)
+        if limit_to_last is not None:
+            query = query.limit_to_last(limit_to_last)
+        return query
+
+    def _get(self, path, shallow, order_by, start_at, limit_to_last):
+        query = self._query(path, order_by, start_at, limit_to_last)
+        if shallow:
+            query = query.shallow()
+        return query.get().val()
+
+    def _set(self, path, value):
+        query = self._query(path)
+        if value is None:
+            query.remove()
+        else:
+            query.set(value)
+
+    def _update(self, updates):
+        self.firebase.database().update(updates)
+
+    def subscribe(self, path, callback, order_by=None, limit_to_last=None):
+        return self._query(path, order_by, None, limit_to_last).stream(callback)
+
+class _Subscription:
+    def __init__(self, storage, path, callback, order_by, limit_to_last):
+        self.storage = storage
+        self.segments = split_path(path)
+        self.callback = callback
+        self.order_by = order_by
+        self.limit_to_last = limit_to_last
+        self.last = None
+
+    def affected_by(self, segments):
+        """Whether a write at segments can change the subscribed node"""
+        common = min(len(segments), len(self.segments))
+        return segments[:common] == self.segments[:common]
+
+    def notify(self):
+        """Send the node's value if it changed since the last notification"""
+        value = self.storage._get("/".join(self.segments), False, self.order_by, None, self.limit_to_last)
+        encoded = json.dumps(value, sort_keys=True)
+        if encoded == self.last:
+            return
+        self.last = encoded
+        try:
+            self.callback({"event": "put", "path": "/", "data": value})
+        except Exception as e:
+            logger.error(f"Storage subscriber failed: {e}")
+
+    def close(self):
+        self.storage._unsubscribe(self)
+
+class MemoryStorage(Storage):
+    """In-process tree with Firebase semantics, for offline runs and benchmarks"""
+
+    name = "memory"
+
+    def __init__(self, data=None):
+        super().__init__()
+        self.data = copy.deepcopy(data) or {}
+        self.lock = threading.RLock()
+        self.subscriptions = []
+
+    def _get(self, path, shallow, order_by, start_at, limit_to_last):
+        with self.lock:
+            value = get_in(self.data, split_path(path))
+            return copy.deepcopy(apply_query(value, shallow, order_by, start_at, limit_to_last))
+
+    def _set(self, path, value):
+        self._update({path: value})
+
+    def _update(self, updates):
+        with self.lock:
+            for path, value in updates.items():
+                self.data = set_in(self.data, split_path(path), copy.deepcopy(resolve_server_values(value))) or {}
+            subscriptions = self._affected(updates)
+        for subscription in subscriptions:
+            subscription.notify()
+
+    def subscribe(self, path, callback, order_by=None, limit_to_last=None):
+        subscription = _Subscription(self, path, callback, order_by, limit_to_last)
+        with self.lock:
+            self.subscriptions.append(subscription)
+        subscription.notify()
+        return subscription
+
+class SQLiteStorage(Storage):
+    """Tree stored in a local SQLite file with one row per second-level node"""
+
+    name = "sqlite"
+
+    def __init__(self, path, poll_interval=0.5):
+        super().__init__()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.path = path
+        self.poll_interval = poll_interval
+        self.lock = threading.RLock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS nodes ("
+            " parent TEXT NOT NULL,"
+            " key TEXT NOT NULL,"
+            " value TEXT NOT NULL,"
+            " PRIMARY KEY (parent, key)) WITHOUT ROWID"
+        )
+        self.conn.commit()
+
+        self.subscriptions = []
+        self.poller = None
+
+    def _read_top(self, top):
+        """Whole value of a top-level node"""
+        rows = self.conn.execute("SELECT key, value FROM nodes WHERE parent = ?", (top,)).fetchall()
+        if rows:
+            return {key: json.loads(value) for key, value in rows}
+        row = self.conn.execute("SELECT value FROM nodes WHERE parent = '' AND key = ?", (top,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _write_top(self, top, value):
+        self.conn.execute("DELETE FROM nodes WHERE parent = ? OR (parent = '' AND key = ?)", (top, top))
+        if isinstance(value, dict):
+            self.conn.executemany(
+                "INSERT INTO nodes (parent, key, value) VALUES (?, ?, ?)",
+                [(top, key, json.dumps(child)) for key, child in value.items()]
+            )
+        elif value is not None:
+            self.conn.execute("INSERT INTO nodes (parent, key, value) VALUES ('', ?, ?)", (top, json.dumps(value)))
+
+    def _get(self, path, shallow, order_by, start_at, limit_to_last):
+        segments = split_path(path)
+        if not segments:
+            raise ValueError("Reading the database root is not supported")
+
+        with self.lock:
+            if len(segments) == 1:
+                if shallow and order_by is None:
+                    keys = self.conn.execute("SELECT key FROM nodes WHERE parent = ?", (segments[0],)).fetchall()
+                    if keys:
+                        return {key: True for key, in keys}
+                if order_by == KEY:
+                    # Key-ordered queries (log cursors, latest entries) use the primary key instead of the whole node
+                    rows = self._key_range(segments[0], start_at, limit_to_last)
+                    if rows or self.conn.execute("SELECT 1 FROM nodes WHERE parent = ? LIMIT 1",
+                                                 (segments[0],)).fetchone():
+                        return apply_query({key: json.loads(value) for key, value in rows}, shallow)
+                value = self._read_top(segments[0])
+            else:
+                row = self.conn.execute(
+                    "SELECT value FROM nodes WHERE parent = ? AND key = ?", (segments[0], segments[1])
+                ).fetchone()
+                value = get_in(json.loads(row[0]), segments[2:]) if row else None
+        return apply_query(value, shallow, order_by, start_at, limit_to_last)
+
+    def _key_range(self, top, start_at, limit_to_last):
+        """(key, value) rows of a top-level node's children in key order, from start_at, the last limit_to_last"""
+        query = "SELECT key, value FROM nodes WHERE parent = ?"
+        params = [top]
+        if start_at is not None:
+            query += " AND key >= ?"
+            params.append(str(start_at))
+        if limit_to_last is not None:
+            rows = self.conn.execute(query + " ORDER BY key DESC LIMIT ?", params + [limit_to_last]).fetchall()
+            return rows[::-1]
+        return self.conn.execute(query + " ORDER BY key", params).fetchall()
+
+    def _write(self, segments, value):
+        if not segments:
+            raise ValueError("Writing the database root is not supported")
+        if len(segments) == 1:
+            self._write_top(segments[0], value)
+            return
+
+        if self.conn.execute("SELECT 1 FROM nodes WHERE parent = '' AND key = ?", (segments[0],)).fetchone():
+            # A scalar top-level node is being replaced by children
+            self.conn.execute("DELETE FROM nodes WHERE parent = '' AND key = ?", (segments[0],))
+
+        row = self.conn.execute(
+            "SELECT value FROM nodes WHERE parent = ? AND key = ?", (segments[0], segments[1])
+        ).fetchone()
+        child = set_in(json.loads(row[0]) if row else None, segments[2:], value)
+        if child is None:
+            self.conn.execute("DELETE FROM nodes WHERE parent = ? AND key = ?", (segments[0], segments[1]))
+        else:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO nodes (parent, key, value) VALUES (?, ?, ?)",
+                (segments[0], segments[1], json.dumps(child))
+            )
+
+    def _set(self, path, value):
+        self._update({path: value})
+
+    def _update(self, updates):
+        with self.lock:
+            with self.conn:
+                for path, value in updates.items():
+                    self._write(split_path(path), resolve_server_values(value))
+            subscriptions = self._affected(updates)
+        for subscription in subscriptions:
+            subscription.notify()
+
+    def subscribe(self, path, callback, order_by=None, limit_to_last=None):
+        subscription = _Subscription(self, path, callback, order_by, limit_to_last)
+        with self.lock:
+            self.subscriptions.append(subscription)
+            if self.poller is None:
+                self.poller = threading.Thread(target=self._poll_subscriptions, daemon=True)
+                self.poller.start()
+        subscription.notify()
+        return subscription
+
+    def _poll_subscriptions(self):
+        """Notice writes from other processes by watching the database's data_version"""
+        version = None
+        while True:
+            time.sleep(self.poll_interval)
+            with self.lock:
+                current = self.conn.execute("PRAGMA data_version").fetchone()[0]
+                subscriptions = list(self.subscriptions)
+            if current != version:
+                version = current
+                for subscription in subscriptions:
+                    subscription.notify()
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+def create_storage(backend, firebase_config=None, sqlite_path=None, data=None):
+    """Storage for a backend name: "firebase", "memory" or "sqlite" """
+    if backend == "firebase":
+        return FirebaseStorage(firebase_config)
+    if backend == "memory":
+        return MemoryStorage(data)
+    if backend == "sqlite":
+        return SQLiteStorage(sqlite_path)
+    raise ValueError(f"Unknown storage backend: {backend}")
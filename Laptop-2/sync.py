@@ -0,0 +1,119 @@
+import logging
+from gallery import FaceGallery
+from encoding_format import decode_encoding
+from storage import iter_node
+
+logger = logging.getLogger(__name__)
+
+class GallerySync:
+    """Incremental synchronisation of known faces from Firebase"""
+
+    def __init__(self, db):
+        self.db = db
+        self.records = {}  # student_id -> (name, encoding, updated_at)
+        self.seen_ids = set()  # every remote key processed, with or without an encoding
+        self.cursor = None  # highest updated_at seen so far
+        self.loaded = False
+        self.changed_ids = set()  # students added or updated by the last load/poll
+
+    def _apply(self, student_id, student_data):
+        """Store one student record, returning True if it changed"""
+        self.seen_ids.add(student_id)
+        if not isinstance(student_data, dict) or 'face_encoding' not in student_data:
+            return self.records.pop(student_id, None) is not None
+
+        updated_at = student_data.get('updated_at')
+        current = self.records.get(student_id)
+        if current is not None and updated_at is not None and current[2] == updated_at:
+            return False
+
+        try:
+            encoding = decode_encoding(student_data['face_encoding'])
+        except Exception as e:
+            logger.error(f"Skipping student {student_id} - unreadable face encoding: {e}")
+            return self.records.pop(student_id, None) is not None
+        self.records[student_id] = (student_data.get('name', 'Unknown'), encoding, updated_at)
+        self.changed_ids.add(student_id)
+
+        if isinstance(updated_at, (int, float)) and (self.cursor is None or updated_at > self.cursor):
+            self.cursor = updated_at
+        return True
+
+    def restore(self, gallery, versions, cursor):
+        """Resume from a cached gallery so the next poll only fetches changes"""
+        self.records = {
+            student_id: (name, gallery.encodings[row], updated_at)
+            for row, (student_id, name, updated_at) in enumerate(zip(gallery.ids, gallery.names, versions))
+        }
+        self.seen_ids = set(self.records)
+        self.cursor = cursor
+        self.loaded = True
+
+    def versions(self, student_ids):
+        """updated_at values for the given students, in order"""
+        return [self.records[student_id][2] for student_id in student_ids]
+
+    def snapshot(self):
+        """Build an immutable gallery from the current records, in student id order"""
+        # A fixed row order lets processes that synced the same students share one cache file
+        gallery = FaceGallery.from_records(
+            (student_id, name, encoding)
+            for student_id, (name, encoding, _) in sorted(self.records.items())
+        )
+        return gallery.freeze()
+
+    def full_load(self):
+        """Download every student and return a fresh gallery snapshot"""
+        if not self.db:
+            logger.error("Cannot load faces - database not initialized")
+            return None
+
+        data = self.db.get("students")
+        self.records = {}
+        self.seen_ids = set()
+        self.changed_ids = set()
+        self.cursor = None
+        for student_id, student_data in iter_node(data):
+            self._apply(student_id, student_data)
+
+        self.loaded = True
+        return self.snapshot()
+
+    def poll(self):
+        """Fetch changes since the last sync; returns a new snapshot or None if nothing changed"""
+        if not self.db:
+            return None
+        if not self.loaded:
+            return self.full_load()
+        self.changed_ids = set()
+
+        # Deletions (and legacy records without updated_at) from a keys-only listing
+        keys = self.db.get("students", shallow=True) or {}
+        remote_ids = {student_id for student_id, _ in iter_node(keys)}
+
+        deleted = self.seen_ids - remote_ids
+        self.seen_ids -= deleted
+        deleted = {student_id for student_id in deleted if self.records.pop(student_id, None) is not None}
+
+        changed = 0
+        if self.cursor is not None:
+            try:
+                data = self.db.get("students", order_by="updated_at", start_at=self.cursor)
+            except Exception as e:
+                # Usually a missing ".indexOn": "updated_at" rule; fall back to a full download
+                logger.warning(f"Delta query failed ({e}); falling back to full sync")
+                return self.full_load()
+
+            for student_id, student_data in iter_node(data):
+                changed += self._apply(student_id, student_data)
+
+        # Students we have never seen (e.g. records written without updated_at)
+        for student_id in remote_ids - self.seen_ids:
+            student_data = self.db.get(f"students/{student_id}")
+            changed += self._apply(student_id, student_data)
+
+        if not changed and not deleted:
+            return None
+
+        logger.info(f"Delta sync: {changed} changed, {len(deleted)} deleted, {len(self.records)} known faces")
+        return self.snapshot()
@@ -0,0 +1,115 @@
+import json
+import hashlib
+import logging
+import threading
+from datetime import date
+import config
+
+logger = logging.getLogger(__name__)
+
+WEEKDAYS = ("mon", "tue", "wed", "thu", "fri", "sat", "sun")
+MINUTES_PER_DAY = 24 * 60
+NO_LECTURES = bytes(MINUTES_PER_DAY)
+
+def to_minutes(hhmm):
+    hours, minutes = hhmm.split(":")
+    return int(hours) * 60 + int(minutes)
+
+def lecture_items(schedule):
+    """(lecture number, times) pairs of a schedule stored as a dict or as a Firebase array"""
+    if isinstance(schedule, list):
+        return [(number, times) for number, times in enumerate(schedule) if times]
+    if isinstance(schedule, dict):
+        return [(int(number), times) for number, times in schedule.items() if times]
+    return []
+
+def compile_day(schedule):
+    """Lecture number for every minute of a day (0 = none); the earlier lecture wins where two meet"""
+    if schedule in (None, False, "off"):
+        return NO_LECTURES
+    minutes = bytearray(MINUTES_PER_DAY)
+    for number, times in sorted(lecture_items(schedule), reverse=True):
+        start, end = to_minutes(times["start"]), to_minutes(times["end"])
+        minutes[start:end + 1] = bytes([number]) * (end + 1 - start)
+    return bytes(minutes)
+
+def compile_week(schedules, inherit=(NO_LECTURES,) * 7):
+    """Seven day tables from a "default" schedule and per-weekday ones ("mon".."sun")"""
+    if isinstance(schedules, list):
+        schedules = {"default": schedules}  # a plain schedule stored as a Firebase array
+    schedules = schedules if isinstance(schedules, dict) else {}
+    if schedules and "default" not in schedules and not any(day in schedules for day in WEEKDAYS):
+        schedules = {"default": schedules}  # a plain {lecture: times} schedule
+    if "default" in schedules:
+        inherit = (compile_day(schedules["default"]),) * len(WEEKDAYS)
+    return tuple(compile_day(schedules[day]) if day in schedules else inherit[i] for i, day in enumerate(WEEKDAYS))
+
+class Timetable:
+    """Compiled lecture lookup for every room, stream and weekday"""
+
+    def __init__(self, default, rooms=None, streams=None, festivals=None):
+        self.default = compile_week(default)
+        # Days a room or stream does not list follow the default timetable
+        self.rooms = {room: compile_week(schedules, self.default) for room, schedules in (rooms or {}).items()}
+        self.streams = {stream: compile_week(schedules, self.default) for stream, schedules in (streams or {}).items()}
+        self.festivals = {}  # date ordinal -> festival name
+        for day, festival in (festivals or {}).items():
+            try:
+                name = festival.get("name", "Holiday") if isinstance(festival, dict) else str(festival)
+                self.festivals[date.fromisoformat(day).toordinal()] = name
+            except (TypeError, ValueError):
+                logger.warning(f"Ignoring festival with invalid date {day!r}")
+        self.lecture_count = max((max(day) for week in self._weeks() for day in week), default=0)
+
+    def _weeks(self):
+        return [self.default] + list(self.rooms.values()) + list(self.streams.values())
+
+    def week_for(self, room=None, stream=None):
+        return self.rooms.get(room) or self.streams.get(stream) or self.default
+
+    def lecture_at(self, at, room=None, stream=None):
+        """Lecture number in progress at the given datetime, or None"""
+        if at.toordinal() in self.festivals:
+            return None
+        return self.week_for(room, stream)[at.weekday()][at.hour * 60 + at.minute] or None
+
+    def festival(self, day):
+        """Festival name for a date, or None"""
+        return self.festivals.get(day.toordinal())
+
+class TimetableSync:
+    """Keeps a Timetable compiled from the timetable and festivals nodes"""
+
+    def __init__(self, default=None, local_rooms=None):
+        self.default = default or config.LECTURE_SCHEDULE
+        self.local_rooms = local_rooms or {}
+        self.lock = threading.Lock()
+        self.digest = None
+        self.compiles = 0
+        self.timetable = self._compile(None, None)
+
+    def _compile(self, timetable, festivals):
+        timetable = timetable if isinstance(timetable, dict) else {}
+        rooms = dict(timetable.get("rooms") or {})
+        rooms.update(self.local_rooms)
+        self.compiles += 1
+        return Timetable(timetable.get("default") or self.default, rooms, timetable.get("streams"),
+                         festivals if isinstance(festivals, dict) else {})
+
+    def refresh(self, db):
+        """Fetch the source nodes and recompile if they changed; returns True when recompiled"""
+        if not db:
+            return False
+        timetable, festivals = db.get("timetable"), db.get("festivals")
+        digest = hashlib.sha1(json.dumps([timetable, festivals], sort_keys=True, default=str).encode()).hexdigest()
+        with self.lock:
+            if digest == self.digest:
+                return False
+            compiled = self._compile(timetable, festivals)
+            self.timetable, self.digest = compiled, digest
+        logger.info(f"Timetable compiled: {len(compiled.rooms)} rooms, {len(compiled.streams)} streams, "
+                    f"{len(compiled.festivals)} festivals")
+        return True
+
+    def lecture_at(self, at, room=None, stream=None):
+        return self.timetable.lecture_at(at, room, stream)
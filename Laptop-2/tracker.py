@@ -0,0 +1,114 @@
+import itertools
+import threading
+
+def box_iou(a, b):
+    """Intersection over union of two (top, right, bottom, left) boxes"""
+    top, bottom = max(a[0], b[0]), min(a[2], b[2])
+    left, right = max(a[3], b[3]), min(a[1], b[1])
+    if bottom <= top or right <= left:
+        return 0.0
+
+    intersection = (bottom - top) * (right - left)
+    area_a = (a[2] - a[0]) * (a[1] - a[3])
+    area_b = (b[2] - b[0]) * (b[1] - b[3])
+    return intersection / float(area_a + area_b - intersection)
+
+class Track:
+    """A face followed across frames together with its resolved identity"""
+
+    def __init__(self, track_id, box, frame_id):
+        self.track_id = track_id
+        self.box = box
+        self.last_frame_id = frame_id
+        self.misses = 0
+        self.student_id = None
+        self.name = "Unknown"
+        self.confidence = 0
+        self.encoded_frame_id = None
+        self.encoding_pending = False
+
+class FaceTracker:
+    """Associates face boxes between frames by IoU so each person is encoded once"""
+
+    def __init__(self, iou_threshold=0.3, max_misses=5, certain_confidence=0.5,
+                 retry_every=3, reverify_every=30):
+        self.iou_threshold = iou_threshold
+        self.max_misses = max_misses
+        self.certain_confidence = certain_confidence
+        self.retry_every = retry_every
+        self.reverify_every = reverify_every
+        self.tracks = []
+        self.track_ids = itertools.count(1)
+        self.lock = threading.Lock()
+
+    def update(self, boxes, frame_id):
+        """Assign a track to every box; returns the tracks aligned with boxes"""
+        with self.lock:
+            # Greedy association, best overlapping pairs first
+            pairs = sorted(
+                ((box_iou(track.box, box), t, b) for t, track in enumerate(self.tracks) for b, box in enumerate(boxes)),
+                reverse=True
+            )
+            assigned = [None] * len(boxes)
+            used = set()
+            for iou, t, b in pairs:
+                if iou < self.iou_threshold:
+                    break
+                if t in used or assigned[b] is not None:
+                    continue
+                assigned[b] = self.tracks[t]
+                used.add(t)
+
+            for t, track in enumerate(self.tracks):
+                if t not in used:
+                    track.misses += 1
+
+            for b, box in enumerate(boxes):
+                if assigned[b] is None:
+                    assigned[b] = Track(next(self.track_ids), box, frame_id)
+                    self.tracks.append(assigned[b])
+                track = assigned[b]
+                track.box = box
+                track.misses = 0
+                track.last_frame_id = max(track.last_frame_id, frame_id)
+
+            self.tracks = [track for track in self.tracks if track.misses <= self.max_misses]
+            return assigned
+
+    def boxes(self):
+        """Last known box of every live track"""
+        with self.lock:
+            return [track.box for track in self.tracks]
+
+    def claim_for_encoding(self, tracks, frame_id):
+        """Indices of tracks whose identity must be (re)computed in this frame"""
+        with self.lock:
+            claimed = []
+            for i, track in enumerate(tracks):
+                if track.encoding_pending:
+                    continue
+                if track.encoded_frame_id is None:
+                    due = True
+                elif track.student_id is None or track.confidence < self.certain_confidence:
+                    due = frame_id - track.encoded_frame_id >= self.retry_every
+                else:
+                    due = frame_id - track.encoded_frame_id >= self.reverify_every
+                if due:
+                    track.encoding_pending = True
+                    claimed.append(i)
+            return claimed
+
+    def resolve(self, track, frame_id, student_id, name, confidence):
+        """Store the identity computed for a track"""
+        with self.lock:
+            track.encoding_pending = False
+            track.encoded_frame_id = frame_id
+            track.student_id = student_id
+            track.name = name
+            track.confidence = confidence
+
+    def release(self, tracks):
+        """Give up claims after a failed encoding so a later frame retries"""
+        with self.lock:
+            for track in tracks:
+                track.encoding_pending = False
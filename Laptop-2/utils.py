@@ -14,6 +14,7 @@ class CameraManager:
         self.width = width
         self.height = height
         self.cap = None
+        self.last_timestamp = None  # live frames are stamped when they are processed
         self.initialize_camera()
 
     def initialize_camera(self):
@@ -51,21 +52,91 @@ class CameraManager:
 class MotionDetector:
     """Utility class for motion detection"""
 
-    def __init__(self, threshold=5000):
+    def __init__(self, threshold=5000, scale=0.25, sample_every=1, method="diff",
+                 diff_threshold=25, min_area=100):
         self.threshold = threshold
-        self.background_subtractor = cv2.createBackgroundSubtractorMOG2(
-            detectShadows=True
-        )
+        self.scale = scale
+        self.sample_every = max(1, sample_every)
+        self.method = method
+        self.diff_threshold = diff_threshold
+        self.min_area = min_area
+        self.frame_count = 0
+        self.motion_amount = 0
+        self.last_result = (False, [])
+        self.shape = None
+
+        if method == "mog2":
+            self.background_subtractor = cv2.createBackgroundSubtractorMOG2(detectShadows=True)
+        elif method != "diff":
+            raise ValueError(f"Unknown motion detection method: {method}")
+
+    def _allocate(self, frame):
+        """Preallocate the small working buffers for this frame size"""
+        height, width = frame.shape[:2]
+        self.shape = frame.shape
+        self.small_size = (max(1, int(width * self.scale)), max(1, int(height * self.scale)))
+        small_w, small_h = self.small_size
+        self.small_bgr = np.empty((small_h, small_w, 3), dtype=np.uint8)
+        self.history = [np.empty((small_h, small_w), dtype=np.uint8) for _ in range(2)]
+        self.current = 0
+        self.has_history = False
+        self.diff = np.empty((small_h, small_w), dtype=np.uint8)
+        self.mask = np.empty((small_h, small_w), dtype=np.uint8)
+        self.dilated = np.empty((small_h, small_w), dtype=np.uint8)
+        # Pixel areas scale with the square of the downscale factor
+        self.area_factor = (width / small_w) * (height / small_h)
 
     def detect_motion(self, frame):
-        """Detect motion in frame"""
-        # Apply background subtraction
-        fg_mask = self.background_subtractor.apply(frame)
+        """Detect motion in frame; returns (motion_detected, changed regions)"""
+        self.frame_count += 1
+        if (self.frame_count - 1) % self.sample_every:
+            return self.last_result
+
+        if self.shape != frame.shape:
+            self._allocate(frame)
+
+        # Downscale first, then convert the small image to grayscale
+        cv2.resize(frame, self.small_size, dst=self.small_bgr, interpolation=cv2.INTER_LINEAR)
+        gray = self.history[self.current]
+        cv2.cvtColor(self.small_bgr, cv2.COLOR_BGR2GRAY, dst=gray)
+
+        if self.method == "mog2":
+            self.background_subtractor.apply(gray, fgmask=self.mask)
+            # Drop shadow pixels (marked 127)
+            cv2.threshold(self.mask, 200, 255, cv2.THRESH_BINARY, dst=self.mask)
+            ready = True
+        else:
+            previous = self.history[1 - self.current]
+            ready = self.has_history
+            if ready:
+                cv2.absdiff(gray, previous, dst=self.diff)
+                cv2.threshold(self.diff, self.diff_threshold, 255, cv2.THRESH_BINARY, dst=self.mask)
+            self.current = 1 - self.current
+            self.has_history = True
+
+        if not ready:
+            self.last_result = (False, [])
+            return self.last_result
 
         # Calculate motion amount
-        motion_amount = np.sum(fg_mask) / 255
-
-        return motion_amount > self.threshold, motion_amount
+        self.motion_amount = cv2.countNonZero(self.mask) * 255 * self.area_factor
+        if self.motion_amount <= self.threshold:
+            self.last_result = (False, [])
+            return self.last_result
+
+        # Bounding boxes of changed areas, scaled back to full resolution
+        cv2.dilate(self.mask, None, dst=self.dilated, iterations=2)
+        contours, _ = cv2.findContours(self.dilated, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        fx = self.shape[1] / self.small_size[0]
+        fy = self.shape[0] / self.small_size[1]
+        regions = []
+        for contour in contours:
+            x, y, w, h = cv2.boundingRect(contour)
+            if w * h * self.area_factor >= self.min_area:
+                regions.append((int(y * fy), int((x + w) * fx), int((y + h) * fy), int(x * fx)))
+
+        self.last_result = (True, regions)
+        return self.last_result
 
 class FaceProcessor:
     """Utility class for face processing operations"""
@@ -96,13 +167,14 @@ class FaceProcessor:
             return None
 
     @staticmethod
-    def validate_face_image(image):
-        """Validate if image contains a clear face"""
+    def validate_face_image(image, face_locations=None):
+        """Validate if image contains a clear face (pass face_locations to reuse an earlier detection)"""
         try:
             import face_recognition
 
             # Try to find faces
-            face_locations = face_recognition.face_locations(image)
+            if face_locations is None:
+                face_locations = face_recognition.face_locations(image)
 
             # Check if exactly one face is found
             if len(face_locations) == 1:
@@ -116,7 +188,7 @@ class FaceProcessor:
             return False, f"Face validation error: {e}"
 
 class DatabaseManager:
-    """Utility class for database operations"""
+    """Utility class for database operations on a storage backend (see storage.py)"""
 
     def __init__(self, db_instance):
         self.db = db_instance
@@ -125,7 +197,7 @@ class DatabaseManager:
         """Safely write data to database with error handling"""
         try:
             if self.db:
-                self.db.child(path).set(data)
+                self.db.set(path, data)
                 return True
         except Exception as e:
             logger.error(f"Database write error at {path}: {e}")
@@ -135,8 +207,7 @@ class DatabaseManager:
         """Safely read data from database with error handling"""
         try:
             if self.db:
-                result = self.db.child(path).get()
-                return result.val() if result else None
+                return self.db.get(path)
         except Exception as e:
             logger.error(f"Database read error at {path}: {e}")
         return None
@@ -145,8 +216,7 @@ class DatabaseManager:
         """Safely push data to database with error handling"""
         try:
             if self.db:
-                result = self.db.child(path).push(data)
-                return result.key if result else None
+                return self.db.push(path, data)
         except Exception as e:
             logger.error(f"Database push error at {path}: {e}")
         return None
@@ -1,13 +1,31 @@
 import os
+import sys
+import csv
+import io
 import json
+import hmac
+import queue
+import threading
+import time
+import logging
 from datetime import datetime, timedelta
-from flask import Flask, render_template, request, jsonify, session, redirect, url_for, flash
-import pyrebase
+from flask import Flask, render_template, request, jsonify, session, redirect, url_for, flash, Response, stream_with_context, g
 import cv2
 import numpy as np
 import base64
 from werkzeug.utils import secure_filename
-import face_recognition
+# Modules shared with the recognition system live in Laptop-2
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Laptop-2'))
+from storage import create_storage
+from attendance_store import AttendanceStore
+from response_cache import ResponseCache
+from enrollment import EnrollmentJobs, parse_bulk_upload, invalid_student_id
+from live_updates import LiveUpdates
+from photo_attendance import PhotoAttendance
+from timetable import TimetableSync
+from pipeline import StageStats
+from metrics import MetricsRegistry, SamplingProfiler, CONTENT_TYPE
+import config  # Laptop-2/config.py, settings shared with the recognizer
 # import { initializeApp } from "firebase/app";
 # import { getAnalytics } from "firebase/analytics";
 
@@ -25,10 +43,9 @@ firebase_config = {
     "appId": "1:1001208569305:web:65ce94e8959a3576bbcdc8"
 }
 
-firebase = pyrebase.initialize_app(firebase_config)
-auth = firebase.auth()
-db = firebase.database()
-storage = firebase.storage()
+# Database backend and SQLite file come from Laptop-2/config.py so both processes always use the same database
+STORAGE_SQLITE_PATH = os.path.join(os.path.dirname(os.path.abspath(config.__file__)), config.STORAGE_SQLITE_PATH)
+db = create_storage(config.STORAGE_BACKEND, firebase_config, STORAGE_SQLITE_PATH)
 
 UPLOAD_FOLDER = 'static/uploads'
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg'}
@@ -37,6 +54,122 @@ app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 # Create upload directory if it doesn't exist
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
+# Local indexed copy of attendance used by reports, followed incrementally from Firebase
+ATTENDANCE_STORE = 'attendance_store.db'
+ATTENDANCE_SYNC_INTERVAL = 15  # seconds
+ATTENDANCE_RECENT_DAYS = 2  # days of attendance re-read whole on every sync (late or direct writes)
+ATTENDANCE_RELOAD_INTERVAL = 6 * 3600  # seconds between full reloads; one also runs at startup
+REPORT_PAGE_SIZE = 500
+REPORT_MAX_PAGE_SIZE = 5000
+STUDENT_FIELDS = ['id', 'name', 'stream', 'email', 'phone']  # returned by the student listing unless fields= is given
+STUDENT_PAGE_SIZE = 100
+STUDENT_MAX_PAGE_SIZE = 1000
+EXPORT_PAGE_SIZE = 1000  # rows read from the store per query while streaming an export
+EXPORT_LECTURES = 5  # lecture columns in CSV exports, matching the dashboard report table
+
+logger = logging.getLogger(__name__)
+attendance_store = AttendanceStore(ATTENDANCE_STORE, ATTENDANCE_RECENT_DAYS, ATTENDANCE_RELOAD_INTERVAL)
+store_sync_lock = threading.Lock()
+
+# Dashboard read endpoints share cached payloads; browsers revalidate them with ETags
+ATTENDANCE_CACHE_TTL = 10  # seconds
+FESTIVALS_CACHE_TTL = 300
+response_cache = ResponseCache()
+
+def cached_json(key, ttl, loader):
+    """JSON response for a cached payload, 304 when the client's ETag still matches"""
+    body, etag = response_cache.get(key, ttl, loader)
+    response = app.response_class(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response.make_conditional(request)
+
+def load_attendance():
+    return db.get("attendance") or {}
+
+def load_festivals():
+    festivals = db.get("festivals")
+    if not isinstance(festivals, dict):
+        festivals = {}
+    return festivals
+
+# Registrations are encoded in worker processes; the request only queues a job
+ENROLLMENT_WORKERS = os.cpu_count()
+ENCODING_FORMAT = 'float32'  # 'float32', 'float16' or 'int8'; see Laptop-2/encoding_format.py
+enrollment_jobs = EnrollmentJobs(db, UPLOAD_FOLDER, ENROLLMENT_WORKERS,
+                                 on_saved=attendance_store.put_student,
+                                 encoding_format=ENCODING_FORMAT)
+
+# One shared Firebase subscription fanned out to every dashboard over Server-Sent Events
+LIVE_KEEPALIVE = 15  # seconds between keep-alive comments on idle event streams
+live_updates = LiveUpdates(db)
+
+# Request and Firebase timings for /metrics; the sampling profiler is switched on from /api/profiler
+metrics = MetricsRegistry("dashboard")
+METRICS_TOKEN = None  # Bearer token that lets a scraper read /metrics without a session; None allows sessions only
+profiler = SamplingProfiler()
+request_stats = {}  # endpoint -> StageStats
+request_stats_lock = threading.Lock()
+store_sync_stats = StageStats("store_sync")
+responses = metrics.counter("responses_total", "Responses by endpoint and status code", ["endpoint", "status"])
+metrics.stages("request_seconds", "Request handling time (until the response starts)", "endpoint",
+               lambda: dict(request_stats))
+metrics.stages("storage_seconds", "Database operation latency", "op", lambda: db.op_stats)
+metrics.stages("store_sync_seconds", "Attendance store sync time", "store", lambda: {"attendance": store_sync_stats})
+metrics.gauge("response_cache_total", "Response cache lookups by result", lambda: {
+    result: response_cache.stats()[result] for result in ("hits", "misses")}, ["result"], type="counter")
+metrics.gauge("live_subscribers", "Dashboards connected to the live event stream",
+              lambda: live_updates.stats()["subscribers"])
+metrics.gauge("enrollment_jobs", "Enrollment jobs kept, by status", enrollment_jobs.stats, ["status"])
+metrics.gauge("attendance_store_loaded", "1 once the local attendance store is loaded",
+              lambda: int(attendance_store.loaded))
+metrics.gauge("profiler_running", "1 while the sampling profiler is on", lambda: int(profiler.running))
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request(response):
+    started = g.pop('request_started', None)
+    if started is not None:
+        endpoint = request.endpoint or 'unmatched'
+        stage = request_stats.get(endpoint)
+        if stage is None:
+            with request_stats_lock:
+                stage = request_stats.setdefault(endpoint, StageStats(endpoint))
+        stage.record(time.perf_counter() - started)
+        responses.inc(endpoint, str(response.status_code))
+    return response
+
+# Group photos from rooms without a camera; faces are detected in tiles across worker processes
+# (tile size, overlap and upsampling are the PHOTO_* settings in Laptop-2/config.py)
+PHOTO_WORKERS = None  # None = one per CPU core
+photo_attendance = PhotoAttendance(db, PHOTO_WORKERS, config.PHOTO_TILE_SIZE, config.PHOTO_TILE_OVERLAP,
+                                   config.PHOTO_UPSAMPLE)
+
+# Lecture timetable shared with Laptop-2 (default in Laptop-2/config.py, overrides and festivals in Firebase)
+timetable = TimetableSync()
+
+def sync_attendance_store():
+    with store_sync_lock, store_sync_stats.timer():
+        return attendance_store.poll(db)
+
+def attendance_sync_thread():
+    """Keep the local attendance store current"""
+    while True:
+        try:
+            sync_attendance_store()
+        except Exception as e:
+            logger.error(f"Attendance store sync failed: {e}")
+        try:
+            timetable.refresh(db)
+        except Exception as e:
+            logger.error(f"Timetable refresh failed: {e}")
+        time.sleep(ATTENDANCE_SYNC_INTERVAL)
+
+threading.Thread(target=attendance_sync_thread, daemon=True).start()
+
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
@@ -87,125 +220,217 @@ def handle_students():
         try:
             data = request.get_json()
             student_id = data.get('id')
+            if invalid_student_id(student_id):
+                return jsonify({'success': False, 'message': invalid_student_id(student_id)}), 400
 
-            # Process and store face encoding if image provided
+            # Decode the photo here so a malformed upload fails the request, not the job
+            photo_bytes = None
             if 'photo_data' in data:
-                photo_data = data['photo_data']
                 # Remove data URL prefix
-                photo_data = photo_data.split(',')[1]
-                photo_bytes = base64.b64decode(photo_data)
-
-                # Save photo
-                photo_filename = f"{student_id}.jpg"
-                photo_path = os.path.join(app.config['UPLOAD_FOLDER'], photo_filename)
-                with open(photo_path, 'wb') as f:
-                    f.write(photo_bytes)
+                photo_bytes = base64.b64decode(data['photo_data'].split(',')[1])
 
-                # Generate face encoding
-                image = face_recognition.load_image_file(photo_path)
-                face_encodings = face_recognition.face_encodings(image)
-
-                if face_encodings:
-                    encoding_list = face_encodings[0].tolist()
-                    data['face_encoding'] = encoding_list
-                    data['photo_path'] = photo_filename
-
-            # Save to Firebase
-            db.child("students").child(student_id).set(data)
-            return jsonify({'success': True, 'message': 'Student registered successfully'})
+            job_id = enrollment_jobs.submit(student_id, data, photo_bytes)
+            return jsonify({'success': True, 'message': 'Registration queued', 'job_id': job_id}), 202
 
         except Exception as e:
             return jsonify({'success': False, 'message': str(e)})
 
     else:
-        try:
-            students = db.child("students").get().val()
-            if not isinstance(students, dict):
-                students = {}
-            return jsonify(students)
-        except:
-            return jsonify({})
+        return list_students()
+
+def list_students():
+    """One page of students from the local store, without face encodings or photos"""
+    fields = STUDENT_FIELDS
+    if request.args.get('fields'):
+        fields = [field.strip() for field in request.args['fields'].split(',') if field.strip()]
+    limit = min(max(request.args.get('limit', STUDENT_PAGE_SIZE, type=int), 1), STUDENT_MAX_PAGE_SIZE)
+
+    try:
+        if not attendance_store.loaded:
+            sync_attendance_store()
+
+        rows, next_cursor = attendance_store.list_students(
+            fields, request.args.get('q'), request.args.get('stream'), request.args.get('cursor'), limit
+        )
+    except Exception as e:
+        logger.error(f"Student listing failed: {e}")
+        return jsonify({'error': str(e)}), 500
+
+    response = jsonify(rows)
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+    response.add_etag()
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response.make_conditional(request)
+
+@app.route('/api/students/bulk', methods=['POST'])
+@login_required
+def bulk_enroll_students():
+    """Register many students from a zip of photos and a CSV manifest"""
+    archive = request.files.get('archive')
+    if archive is None:
+        return jsonify({'success': False, 'message': 'A zip archive of photos is required'}), 400
+
+    try:
+        manifest = request.files.get('manifest')
+        manifest_text = manifest.read().decode('utf-8-sig') if manifest else None
+        entries = parse_bulk_upload(archive.read(), manifest_text)
+    except Exception as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+
+    job_id = enrollment_jobs.submit_bulk(entries)
+    return jsonify({'success': True, 'message': f'{len(entries)} students queued', 'job_id': job_id}), 202
+
+@app.route('/api/attendance/photos', methods=['POST'])
+@login_required
+def photo_attendance_upload():
+    """Mark attendance for a date and lecture from one or more group photos"""
+    photos = [photo for photo in request.files.getlist('photos') if photo and allowed_file(photo.filename)]
+    if not photos:
+        return jsonify({'success': False, 'message': 'At least one photo (png/jpg) is required'}), 400
+
+    room = request.form.get('room') or None
+    try:
+        date = datetime.strptime(request.form.get('date', ''), '%Y-%m-%d').strftime('%Y-%m-%d')
+        lecture = int(request.form['lecture']) if request.form.get('lecture') else None
+    except ValueError:
+        return jsonify({'success': False, 'message': 'date (YYYY-MM-DD) and lecture number are required'}), 400
+    if lecture is None:
+        # Photos uploaded during a lecture may leave it out; the room's timetable decides
+        now = datetime.now()
+        if date != now.strftime('%Y-%m-%d'):
+            return jsonify({'success': False, 'message': 'lecture is required for photos of another day'}), 400
+        lecture = timetable.lecture_at(now, room)
+        if not lecture:
+            return jsonify({'success': False, 'message': 'No lecture in progress; give the lecture number'}), 400
+    dry_run = request.form.get('dry_run', '').lower() in ('1', 'true', 'yes')
+
+    try:
+        report = photo_attendance.run(
+            [(secure_filename(photo.filename), photo.read()) for photo in photos],
+            date, lecture, room, dry_run,
+        )
+    except Exception as e:
+        logger.error(f"Photo attendance failed: {e}")
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+    if report['marked'] and not dry_run:
+        response_cache.invalidate('attendance')
+    return jsonify({'success': True, 'dry_run': dry_run, **report})
+
+@app.route('/api/enrollment-jobs/<job_id>')
+@login_required
+def enrollment_job_status(job_id):
+    job = enrollment_jobs.status(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown job'}), 404
+    return jsonify(job)
 
 @app.route('/api/attendance')
 @login_required
 def get_attendance():
     try:
-        attendance = db.child("attendance").get().val()
-        return jsonify(attendance or {})
+        return cached_json('attendance', ATTENDANCE_CACHE_TTL, load_attendance)
     except:
         return jsonify({})
 
+def report_filters():
+    """stream, start_date, end_date and the (date, student_id) cursor from the query string"""
+    after = None
+    cursor = request.args.get('cursor')
+    if cursor:
+        # Pages continue after the (date, student_id) of the previous page's last row
+        after = tuple(cursor.split(',', 1))
+        if len(after) != 2:
+            raise ValueError("cursor must be '<date>,<student_id>'")
+    return request.args.get('stream'), request.args.get('start_date'), request.args.get('end_date'), after
+
 @app.route('/api/attendance/report')
 @login_required
 def get_attendance_report():
     try:
-        stream = request.args.get('stream')
-        start_date = request.args.get('start_date')
-        end_date = request.args.get('end_date')
-
-        attendance = db.child("attendance").get().val() or {}
-        students = db.child("students").get().val() or {}
-
-        # Filter attendance based on parameters
-        filtered_data = []
-        if isinstance(attendance, dict):
-            attendance_iter = attendance.items()
-        elif isinstance(attendance, list):
-            attendance_iter = enumerate(attendance)
-        else:
-            attendance_iter = []
-
-        for date, records in attendance_iter:
-            if start_date and str(date) < str(start_date):
-                continue
-            if end_date and str(date) > str(end_date):
-                continue
-
-            if isinstance(records, dict):
-                records_iter = records.items()
-            elif isinstance(records, list):
-                records_iter = enumerate(records)
-            else:
-                records_iter = []
-
-            for student_id, lectures in records_iter:
-                if isinstance(students, dict):
-                    student = students.get(str(student_id), {})
-                elif isinstance(students, list):
-                    try:
-                        student = students[int(student_id)]
-                    except (ValueError, IndexError, TypeError):
-                        student = {}
-                else:
-                    student = {}
-
-                if stream and student.get('stream', '') != stream:
-                    continue
+        stream, start_date, end_date, after = report_filters()
+        limit = min(request.args.get('limit', REPORT_PAGE_SIZE, type=int), REPORT_MAX_PAGE_SIZE)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
 
-                filtered_data.append({
-                    'date': date,
-                    'student_id': student_id,
-                    'student_name': student.get('name', 'Unknown'),
-                    'stream': student.get('stream', ''),
-                    'lectures': lectures
-                })
+    try:
+        if not attendance_store.loaded:
+            sync_attendance_store()
+
+        rows, next_cursor = attendance_store.report(stream, start_date, end_date, after, max(limit, 1))
+        response = jsonify(rows)
+        if next_cursor:
+            response.headers['X-Next-Cursor'] = ','.join(next_cursor)
+        return response
+    except Exception as e:
+        logger.error(f"Attendance report failed: {e}")
+        return jsonify({'error': str(e)}), 500
+
+def csv_lines(rows):
+    """Encode report rows as CSV, one line at a time"""
+    lectures = [f"lecture{n}" for n in range(1, EXPORT_LECTURES + 1)]
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(['date', 'student_id', 'student_name', 'stream'] + lectures)
+    for row in rows:
+        writer.writerow([row['date'], row['student_id'], row['student_name'], row['stream']] +
+                        [row['lectures'].get(lecture, 'Absent') for lecture in lectures])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+def ndjson_lines(rows):
+    for row in rows:
+        yield json.dumps(row) + '\n'
+
+@app.route('/api/attendance/export')
+@login_required
+def export_attendance():
+    """Stream the attendance report as CSV or NDJSON, resumable from cursor=<date>,<student_id>"""
+    export_format = request.args.get('format', 'csv')
+    if export_format not in ('csv', 'ndjson'):
+        return jsonify({'error': "format must be 'csv' or 'ndjson'"}), 400
+    try:
+        stream, start_date, end_date, after = report_filters()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
 
-        return jsonify(filtered_data)
+    try:
+        if not attendance_store.loaded:
+            sync_attendance_store()
     except Exception as e:
-        return jsonify([])
+        logger.error(f"Attendance export failed: {e}")
+        return jsonify({'error': str(e)}), 500
+
+    def generate():
+        rows = attendance_store.iter_report(stream, start_date, end_date, after, EXPORT_PAGE_SIZE)
+        lines = csv_lines(rows) if export_format == 'csv' else ndjson_lines(rows)
+        try:
+            yield from lines
+        except Exception as e:
+            # Headers are already sent; abort the connection so the client sees an incomplete download
+            logger.error(f"Attendance export failed mid-stream: {e}")
+            raise
+
+    filename = f"attendance_{start_date or 'all'}_{end_date or 'all'}.{export_format}"
+    mimetype = 'text/csv' if export_format == 'csv' else 'application/x-ndjson'
+    return Response(stream_with_context(generate()), mimetype=mimetype,
+                    headers={'Content-Disposition': f'attachment; filename="{filename}"'})
 
 @app.route('/api/system-status')
 @login_required
 def system_status():
     try:
         # Check connection to Firebase
-        db.child("system").child("laptop1_status").set({
+        db.set("system/laptop1_status", {
             "status": "connected",
             "last_update": datetime.now().isoformat()
         })
 
         # Get Laptop-2 status
-        laptop2_status = db.child("system").child("laptop2_status").get().val()
+        laptop2_status = db.get("system/laptop2_status")
 
         # Handle laptop2_status type
         if isinstance(laptop2_status, dict):
@@ -229,14 +454,84 @@ def system_status():
             'last_sync': None
         })
 
+@app.route('/api/live')
+@login_required
+def live_events():
+    """Server-Sent Events stream of recognitions and Laptop-2 status changes"""
+    events = live_updates.subscribe()
+
+    def generate():
+        try:
+            while True:
+                try:
+                    event, data = events.get(timeout=LIVE_KEEPALIVE)
+                except queue.Empty:
+                    # Keeps proxies from closing the idle connection and detects gone clients
+                    yield ": keepalive\n\n"
+                    continue
+                yield LiveUpdates.format_event(event, data)
+        finally:
+            live_updates.unsubscribe(events)
+
+    return Response(generate(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+def metrics_token_valid():
+    """Check the request's "Authorization: Bearer" header against METRICS_TOKEN"""
+    if not METRICS_TOKEN:
+        return False
+    auth = request.headers.get('Authorization', '')
+    supplied = auth[len('Bearer '):].strip() if auth.startswith('Bearer ') else ''
+    return hmac.compare_digest(supplied.encode(), METRICS_TOKEN.encode())
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Prometheus text exposition of request, storage and sync timings"""
+    if 'user' not in session and not metrics_token_valid():
+        return Response("unauthorized\n", status=401, content_type='text/plain')
+    return Response(metrics.render(), content_type=CONTENT_TYPE)
+
+@app.route('/api/profiler', methods=['GET', 'POST'])
+@login_required
+def profiler_control():
+    """Switch the sampling profiler on or off; GET with ?format=folded returns its stacks"""
+    if request.method == 'POST':
+        data = request.get_json(silent=True) or request.form
+        action = data.get('action')
+        if action == 'start':
+            try:
+                interval = float(data.get('interval_ms') or 0) / 1000
+            except (TypeError, ValueError):
+                return jsonify({'error': 'interval_ms must be a number'}), 400
+            profiler.start(interval or None)
+        elif action == 'stop':
+            profiler.stop()
+        else:
+            return jsonify({'error': "action must be 'start' or 'stop'"}), 400
+    elif request.args.get('format') == 'folded':
+        return Response(profiler.folded(request.args.get('limit', type=int)), mimetype='text/plain')
+    return jsonify(profiler.status())
+
+@app.route('/api/timetable/current')
+@login_required
+def current_lecture():
+    """Lecture in progress for a room or stream, now or at ?at=YYYY-MM-DDTHH:MM"""
+    try:
+        at = datetime.fromisoformat(request.args['at']) if request.args.get('at') else datetime.now()
+    except ValueError:
+        return jsonify({'error': 'at must be an ISO date and time'}), 400
+    compiled = timetable.timetable
+    return jsonify({
+        'at': at.isoformat(timespec='minutes'),
+        'lecture': compiled.lecture_at(at, request.args.get('room'), request.args.get('stream')),
+        'festival': compiled.festival(at.date()),
+    })
+
 @app.route('/api/festivals')
 @login_required
 def get_festivals():
     try:
-        festivals = db.child("festivals").get().val()
-        if not isinstance(festivals, dict):
-            festivals = {}
-        return jsonify(festivals)
+        return cached_json('festivals', FESTIVALS_CACHE_TTL, load_festivals)
     except Exception as e:
         return jsonify({})
 
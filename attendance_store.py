@@ -0,0 +1,287 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import logging
+from datetime import date, timedelta
+from storage import KEY, iter_node
+
+logger = logging.getLogger(__name__)
+
+# Never copied into the local store, so they cannot be served from it
+PRIVATE_STUDENT_FIELDS = {'face_encoding', 'photo_data', 'updated_at'}
+
+class AttendanceStore:
+    """Local SQLite copy of attendance and students for report queries"""
+
+    def __init__(self, path, recent_days=2, reload_interval=6 * 3600):
+        self.path = path
+        self.recent_days = recent_days
+        self.reload_interval = reload_interval
+        self.loaded_at = None  # monotonic time of this process's last full load
+        self.lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(
+            "CREATE TABLE IF NOT EXISTS students ("
+            " student_id TEXT PRIMARY KEY,"
+            " name TEXT NOT NULL,"
+            " stream TEXT NOT NULL,"
+            " updated_at INTEGER,"
+            " details TEXT NOT NULL DEFAULT '{}');"
+            "CREATE INDEX IF NOT EXISTS students_stream ON students (stream, student_id);"
+            "CREATE TABLE IF NOT EXISTS attendance ("
+            " date TEXT NOT NULL,"
+            " student_id TEXT NOT NULL,"
+            " lecture TEXT NOT NULL,"
+            " status TEXT NOT NULL,"
+            " PRIMARY KEY (date, student_id, lecture)) WITHOUT ROWID;"
+            "CREATE INDEX IF NOT EXISTS attendance_student ON attendance (student_id, date);"
+            "CREATE TABLE IF NOT EXISTS sync_state ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT)"
+        )
+        self._migrate()
+        self.conn.commit()
+
+    def _migrate(self):
+        """Bring stores created by older versions up to the current schema"""
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(students)")}
+        if 'details' not in columns:
+            self.conn.execute("ALTER TABLE students ADD COLUMN details TEXT NOT NULL DEFAULT '{}'")
+            # Existing rows have no details yet; reload everything on the next sync
+            self._set_state("loaded", False)
+
+    def _get_state(self, key):
+        row = self.conn.execute("SELECT value FROM sync_state WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _set_state(self, key, value):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO sync_state (key, value) VALUES (?, ?)", (key, json.dumps(value))
+        )
+
+    @property
+    def loaded(self):
+        with self.lock:
+            return bool(self._get_state("loaded"))
+
+    def _put_student(self, student_id, student_data):
+        if not isinstance(student_data, dict):
+            self.conn.execute("DELETE FROM students WHERE student_id = ?", (student_id,))
+            return
+        updated_at = student_data.get('updated_at')
+        details = {key: value for key, value in student_data.items() if key not in PRIVATE_STUDENT_FIELDS}
+        details['id'] = student_id
+        self.conn.execute(
+            "INSERT OR REPLACE INTO students (student_id, name, stream, updated_at, details) VALUES (?, ?, ?, ?, ?)",
+            (student_id, student_data.get('name', 'Unknown'), student_data.get('stream', ''),
+             updated_at if isinstance(updated_at, (int, float)) else None, json.dumps(details))
+        )
+
+    def put_student(self, student_id, student_data):
+        """Record a student just written to Firebase without waiting for the next sync"""
+        with self.lock:
+            with self.conn:
+                self._put_student(student_id, student_data)
+
+    def _replace_date(self, date, records):
+        """Make the local rows of one date match its Firebase node"""
+        self.conn.execute("DELETE FROM attendance WHERE date = ?", (date,))
+        for student_id, lectures in iter_node(records):
+            self._put_attendance(date, student_id, lectures)
+
+    def _put_attendance(self, date, student_id, lectures):
+        for lecture, status in iter_node(lectures):
+            if not lecture.startswith("lecture"):
+                lecture = f"lecture{lecture}"
+            self.conn.execute(
+                "INSERT OR REPLACE INTO attendance (date, student_id, lecture, status) VALUES (?, ?, ?, ?)",
+                (date, student_id, lecture, str(status))
+            )
+
+    def full_load(self, db):
+        """Replace the local copy with the current Firebase contents"""
+        attendance = db.get("attendance")
+        students = db.get("students")
+        last_log = db.get("attendance_logs", order_by=KEY, limit_to_last=1)
+        log_cursor = next((key for key, _ in iter_node(last_log)), None)
+
+        with self.lock:
+            with self.conn:
+                self.conn.execute("DELETE FROM attendance")
+                self.conn.execute("DELETE FROM students")
+                for date, records in iter_node(attendance):
+                    for student_id, lectures in iter_node(records):
+                        self._put_attendance(date, student_id, lectures)
+                for student_id, student_data in iter_node(students):
+                    self._put_student(student_id, student_data)
+
+                cursor = self.conn.execute("SELECT MAX(updated_at) FROM students").fetchone()[0]
+                self._set_state("log_cursor", log_cursor)
+                self._set_state("student_cursor", cursor)
+                self._set_state("loaded", True)
+            self.loaded_at = time.monotonic()
+
+        logger.info("Attendance store loaded from Firebase")
+
+    def poll(self, db):
+        """Apply changes made since the last sync; returns the number of rows touched"""
+        with self.lock:
+            loaded = self._get_state("loaded")
+            log_cursor = self._get_state("log_cursor")
+            student_cursor = self._get_state("student_cursor")
+        if (not loaded or self.loaded_at is None
+                or (self.reload_interval and time.monotonic() - self.loaded_at > self.reload_interval)):
+            self.full_load(db)
+            return 0
+
+        try:
+            logs = db.get("attendance_logs", order_by=KEY, start_at=log_cursor)
+            students = None
+            if student_cursor is not None:
+                students = db.get("students", order_by="updated_at", start_at=student_cursor)
+        except Exception as e:
+            logger.warning(f"Delta query failed ({e}); reloading attendance store")
+            self.full_load(db)
+            return 0
+
+        keys = db.get("students", shallow=True) or {}
+        remote_ids = {student_id for student_id, _ in iter_node(keys)}
+
+        # Recent days are re-read whole: catches records whose log sorts below the cursor and direct writes
+        today = date.today()
+        recent = {}
+        for days in range(self.recent_days):
+            day = (today - timedelta(days=days)).strftime("%Y-%m-%d")
+            recent[day] = db.get(f"attendance/{day}")
+
+        touched = 0
+        with self.lock:
+            with self.conn:
+                for key, log in iter_node(logs):
+                    if key == log_cursor or not isinstance(log, dict):
+                        continue
+                    if log.get('date') and log.get('student_id') and log.get('lecture') is not None:
+                        self._put_attendance(log['date'], str(log['student_id']),
+                                             {str(log['lecture']): log.get('status', 'Present')})
+                        touched += 1
+                    log_cursor = key
+
+                for day, records in recent.items():
+                    self._replace_date(day, records)
+
+                for student_id, student_data in iter_node(students):
+                    self._put_student(student_id, student_data)
+                    touched += 1
+
+                local_ids = {row[0] for row in self.conn.execute("SELECT student_id FROM students")}
+                for student_id in local_ids - remote_ids:
+                    self.conn.execute("DELETE FROM students WHERE student_id = ?", (student_id,))
+                    touched += 1
+                missing = remote_ids - local_ids
+
+                cursor = self.conn.execute("SELECT MAX(updated_at) FROM students").fetchone()[0]
+                self._set_state("log_cursor", log_cursor)
+                self._set_state("student_cursor", cursor)
+
+        # Students written without updated_at are not returned by the ordered query
+        for student_id in missing:
+            student_data = db.get(f"students/{student_id}")
+            with self.lock:
+                with self.conn:
+                    self._put_student(student_id, student_data)
+            touched += 1
+
+        return touched
+
+    def report(self, stream=None, start_date=None, end_date=None, after=None, limit=500):
+        """One page of report rows after the (date, student_id) cursor; returns (rows, next_cursor)"""
+        clauses = []
+        params = []
+        if start_date:
+            clauses.append("a.date >= ?")
+            params.append(start_date)
+        if end_date:
+            clauses.append("a.date <= ?")
+            params.append(end_date)
+        if after:
+            clauses.append("(a.date, a.student_id) > (?, ?)")
+            params.extend(after)
+        if stream:
+            clauses.append("s.stream = ?")
+            params.append(stream)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT a.date, a.student_id, COALESCE(s.name, 'Unknown'), COALESCE(s.stream, ''),"
+                " json_group_object(a.lecture, a.status)"
+                " FROM attendance a LEFT JOIN students s ON s.student_id = a.student_id"
+                f" {where}"
+                " GROUP BY a.date, a.student_id"
+                " ORDER BY a.date, a.student_id"
+                " LIMIT ?",
+                params + [limit + 1]
+            ).fetchall()
+
+        page = [{
+            'date': date,
+            'student_id': student_id,
+            'student_name': name,
+            'stream': student_stream,
+            'lectures': json.loads(lectures)
+        } for date, student_id, name, student_stream, lectures in rows[:limit]]
+
+        next_cursor = None
+        if len(rows) > limit:
+            next_cursor = (page[-1]['date'], page[-1]['student_id'])
+        return page, next_cursor
+
+    def list_students(self, fields, search=None, stream=None, after=None, limit=100):
+        """One page of students after the id cursor, projected to fields; returns (rows, next_cursor)"""
+        clauses = []
+        params = []
+        if stream:
+            clauses.append("stream = ?")
+            params.append(stream)
+        if search:
+            pattern = '%' + search.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+            clauses.append("(student_id LIKE ? ESCAPE '\\' OR name LIKE ? ESCAPE '\\')")
+            params.extend([pattern, pattern])
+        if after:
+            clauses.append("student_id > ?")
+            params.append(after)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+
+        with self.lock:
+            rows = self.conn.execute(
+                f"SELECT student_id, details FROM students {where} ORDER BY student_id LIMIT ?",
+                params + [limit + 1]
+            ).fetchall()
+
+        page = []
+        for student_id, details in rows[:limit]:
+            details = json.loads(details)
+            page.append({field: details.get(field) for field in fields})
+
+        next_cursor = rows[limit - 1][0] if len(rows) > limit else None
+        return page, next_cursor
+
+    def iter_report(self, stream=None, start_date=None, end_date=None, after=None, page_size=1000):
+        """Yield every report row after the cursor, reading one page at a time"""
+        while True:
+            rows, after = self.report(stream, start_date, end_date, after, page_size)
+            yield from rows
+            if after is None:
+                return
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
@@ -0,0 +1,270 @@
+import csv
+import io
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+import zipfile
+import logging
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import face_recognition
+
+# Face utilities are shared with the recognition system
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Laptop-2'))
+from utils import FaceProcessor
+from encoding_format import encode_encoding
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = 'manifest.csv'
+PHOTO_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+# Characters Firebase forbids in keys; '/' would also nest the record and let the photo name escape uploads
+INVALID_ID_CHARS = re.compile(r'[./$#\[\]]')
+
+def invalid_student_id(student_id):
+    """Reason a student id cannot be used as a database key and photo name, or None"""
+    if not student_id:
+        return "Missing id"
+    if INVALID_ID_CHARS.search(str(student_id)):
+        return "Id may not contain . / $ # [ or ]"
+    return None
+
+def encode_photo(photo_bytes, fmt="float32"):
+    """Packed face encoding of the first face in an encoded image, or None if no face is found"""
+    image = face_recognition.load_image_file(io.BytesIO(photo_bytes))
+    face_encodings = face_recognition.face_encodings(image)
+    if not face_encodings:
+        return None
+    return encode_encoding(face_encodings[0], fmt)
+
+def encode_validated(photo_bytes, fmt="float32"):
+    """(packed encoding, message) for a photo that must show exactly one face; encoding is None if it does not"""
+    try:
+        image = face_recognition.load_image_file(io.BytesIO(photo_bytes))
+    except Exception as e:
+        return None, f"Unreadable image: {e}"
+
+    face_locations = face_recognition.face_locations(image)
+    valid, message = FaceProcessor.validate_face_image(image, face_locations)
+    if not valid:
+        return None, message
+    return encode_encoding(face_recognition.face_encodings(image, face_locations)[0], fmt), message
+
+def parse_bulk_upload(archive_bytes, manifest_text=None):
+    """Rows of a bulk enrollment from a zip of photos and a CSV manifest"""
+    archive = zipfile.ZipFile(io.BytesIO(archive_bytes))
+    photos = {}
+    for name in archive.namelist():
+        base = os.path.basename(name)
+        if base.lower().endswith(PHOTO_EXTENSIONS):
+            photos[base] = name
+            photos.setdefault(os.path.splitext(base)[0], name)
+
+    if manifest_text is None:
+        manifest_name = next((name for name in archive.namelist() if os.path.basename(name) == MANIFEST_NAME), None)
+        if manifest_name is None:
+            raise ValueError(f"No manifest provided and no {MANIFEST_NAME} in the archive")
+        manifest_text = archive.read(manifest_name).decode('utf-8-sig')
+
+    reader = csv.DictReader(io.StringIO(manifest_text))
+    if 'id' not in (reader.fieldnames or []):
+        raise ValueError("Manifest must have an 'id' column")
+
+    entries = []
+    seen = set()
+    for row_number, row in enumerate(reader, start=2):  # row 1 is the header
+        student_id = (row.pop('id') or '').strip()
+        photo_name = (row.pop('photo', None) or '').strip()
+        data = {key: value.strip() for key, value in row.items() if key and value}
+        data['id'] = student_id
+        entry = {'row': row_number, 'student_id': student_id, 'data': data, 'photo': None, 'error': None}
+
+        member = photos.get(photo_name or student_id)
+        if invalid_student_id(student_id):
+            entry['error'] = invalid_student_id(student_id)
+        elif student_id in seen:
+            entry['error'] = "Duplicate id in manifest"
+        elif member is None:
+            entry['error'] = f"Photo {photo_name or student_id} not found in archive"
+        else:
+            entry['photo'] = (os.path.splitext(member)[1].lower(), archive.read(member))
+        seen.add(student_id)
+        entries.append(entry)
+    return entries
+
+class EnrollmentJobs:
+    """Student registrations processed off the request thread"""
+
+    def __init__(self, db, upload_folder, workers=2, job_ttl=3600, on_saved=None, write_batch=50,
+                 encoding_format="float32"):
+        self.db = db
+        self.write_batch = write_batch
+        self.encoding_format = encoding_format
+        self.upload_folder = upload_folder
+        self.job_ttl = job_ttl
+        self.on_saved = on_saved
+        self.encoder_pool = ProcessPoolExecutor(max_workers=workers)
+        self.runner = ThreadPoolExecutor(max_workers=workers * 2, thread_name_prefix="enrollment")
+        self.jobs = {}
+        self.lock = threading.Lock()
+
+    def _update(self, job_id, **fields):
+        with self.lock:
+            self.jobs[job_id].update(fields)
+
+    def _prune(self):
+        """Forget finished jobs older than job_ttl"""
+        cutoff = time.time() - self.job_ttl
+        for job_id, job in list(self.jobs.items()):
+            if job['finished_at'] and job['finished_at'] < cutoff:
+                del self.jobs[job_id]
+
+    def _new_job(self, **fields):
+        job_id = uuid.uuid4().hex
+        with self.lock:
+            self._prune()
+            self.jobs[job_id] = dict({
+                'job_id': job_id,
+                'status': 'queued',
+                'message': '',
+                'created_at': time.time(),
+                'finished_at': None,
+            }, **fields)
+        return job_id
+
+    def submit(self, student_id, data, photo_bytes=None):
+        """Queue a registration; returns the job id"""
+        job_id = self._new_job(student_id=student_id, face_found=None)
+        self.runner.submit(self._run, job_id, student_id, data, photo_bytes)
+        return job_id
+
+    def submit_bulk(self, entries):
+        """Queue a bulk enrollment of parse_bulk_upload() entries; returns the job id"""
+        job_id = self._new_job(total=len(entries), processed=0, succeeded=0, failed=0, report=[])
+        self.runner.submit(self._run_bulk, job_id, entries)
+        return job_id
+
+    def _run(self, job_id, student_id, data, photo_bytes):
+        self._update(job_id, status='running')
+        try:
+            # The photo is kept under static/uploads, not inside the student record
+            data.pop('photo_data', None)
+            photo_filename = None
+            if photo_bytes:
+                encoding = self.encoder_pool.submit(encode_photo, photo_bytes, self.encoding_format).result()
+                self._update(job_id, face_found=encoding is not None)
+                if encoding is None:
+                    # A student without an encoding could never be recognised; nothing is saved
+                    self._update(job_id, status='failed', message='No face detected in the photo; please retake it',
+                                 finished_at=time.time())
+                    return
+                photo_filename = f"{student_id}.jpg"
+                data['face_encoding'] = encoding
+                data['photo_path'] = photo_filename
+
+            # Server timestamp lets Laptop-2 fetch only students changed since its last sync
+            data['updated_at'] = {".sv": "timestamp"}
+            self.db.set(f"students/{student_id}", data)
+
+            # Written only once the student is stored, so a failed write leaves no orphaned photo
+            if photo_filename:
+                with open(os.path.join(self.upload_folder, photo_filename), 'wb') as f:
+                    f.write(photo_bytes)
+            if self.on_saved:
+                self.on_saved(student_id, data)
+
+            self._update(job_id, status='done', message='Student registered successfully', finished_at=time.time())
+        except Exception as e:
+            logger.error(f"Enrollment of {student_id} failed: {e}")
+            self._update(job_id, status='failed', message=str(e), finished_at=time.time())
+
+    def _commit_batch(self, updates, entries):
+        """Write one multi-path update of students, then their photos, recording the outcome per entry"""
+        try:
+            self.db.update(updates)
+        except Exception as e:
+            logger.error(f"Bulk enrollment write failed: {e}")
+            for entry in entries:
+                entry['error'] = f"Database write failed: {e}"
+            return
+
+        for entry in entries:
+            try:
+                with open(os.path.join(self.upload_folder, entry['data']['photo_path']), 'wb') as f:
+                    f.write(entry['photo'][1])
+            except OSError as e:
+                logger.error(f"Saving photo of {entry['student_id']} failed: {e}")
+                entry['error'] = f"Photo could not be saved: {e}"
+            if self.on_saved:
+                self.on_saved(entry['student_id'], entry['data'])
+
+    def _run_bulk(self, job_id, entries):
+        self._update(job_id, status='running')
+        try:
+            ready = [entry for entry in entries if entry['error'] is None]
+            # Rows rejected while parsing count as handled from the start
+            processed = len(entries) - len(ready)
+            self._update(job_id, processed=processed)
+            futures = [self.encoder_pool.submit(encode_validated, entry['photo'][1], self.encoding_format)
+                       for entry in ready]
+
+            updates, batch = {}, []
+            for entry, future in zip(ready, futures):
+                try:
+                    encoding, message = future.result()
+                except Exception as e:
+                    # One bad photo (or a crashed worker) fails its row, not the whole job
+                    logger.error(f"Encoding photo of {entry['student_id']} failed: {e}")
+                    encoding, message = None, f"Encoding failed: {e}"
+
+                if encoding is None:
+                    entry['error'] = message
+                else:
+                    data = entry['data']
+                    data['face_encoding'] = encoding
+                    data['photo_path'] = f"{entry['student_id']}{entry['photo'][0]}"
+                    data['updated_at'] = {".sv": "timestamp"}
+                    updates[f"students/{entry['student_id']}"] = data
+                    batch.append(entry)
+
+                if len(batch) >= self.write_batch:
+                    self._commit_batch(updates, batch)
+                    updates, batch = {}, []
+                processed += 1
+                self._update(job_id, processed=processed)
+
+            if batch:
+                self._commit_batch(updates, batch)
+
+            report = [{
+                'row': entry['row'],
+                'student_id': entry['student_id'],
+                'success': entry['error'] is None,
+                'message': entry['error'] or 'Registered',
+            } for entry in entries]
+            succeeded = sum(item['success'] for item in report)
+            self._update(job_id, status='done', report=report, succeeded=succeeded,
+                         failed=len(report) - succeeded, processed=len(entries),
+                         message=f"{succeeded} of {len(report)} students registered", finished_at=time.time())
+        except Exception as e:
+            logger.error(f"Bulk enrollment failed: {e}")
+            self._update(job_id, status='failed', message=str(e), finished_at=time.time())
+
+    def status(self, job_id):
+        """Copy of the job's state, or None for an unknown job"""
+        with self.lock:
+            job = self.jobs.get(job_id)
+            return dict(job) if job else None
+
+    def stats(self):
+        with self.lock:
+            counts = {}
+            for job in self.jobs.values():
+                counts[job['status']] = counts.get(job['status'], 0) + 1
+            return counts
+
+    def shutdown(self):
+        self.runner.shutdown(wait=True)
+        self.encoder_pool.shutdown(wait=True)
@@ -0,0 +1,135 @@
+import json
+import queue
+import threading
+import logging
+from storage import KEY
+
+logger = logging.getLogger(__name__)
+
+class LiveUpdates:
+    """Fan-out of Firebase changes to every connected dashboard"""
+
+    def __init__(self, db, queue_size=100):
+        self.db = db
+        self.queue_size = queue_size
+        self.subscribers = set()
+        # Re-entrant: local storage backends deliver the initial value from inside subscribe()
+        self.lock = threading.RLock()
+        self.streams = []
+        self.status = {}
+        self.last_recognition = None
+        self.published = 0
+
+    def _start(self):
+        """Open the upstream streams (called with the lock held)"""
+        if self.streams or not self.db:
+            return
+        try:
+            self.streams = [
+                # limit_to_last(1): only the newest existing log is replayed on connect
+                self.db.subscribe("attendance_logs", self._on_logs, order_by=KEY, limit_to_last=1),
+                self.db.subscribe("system/laptop2_status", self._on_status),
+            ]
+            logger.info("Live update streams opened")
+        except Exception as e:
+            logger.error(f"Failed to open live update streams: {e}")
+            self.close()
+
+    def subscribe(self):
+        """Register a dashboard; returns its event queue"""
+        events = queue.Queue(maxsize=self.queue_size)
+        with self.lock:
+            self._start()
+            self.subscribers.add(events)
+            if self.status:
+                events.put(("status", self._public_status()))
+            if self.last_recognition:
+                events.put(("recognition", self.last_recognition))
+        return events
+
+    def unsubscribe(self, events):
+        with self.lock:
+            self.subscribers.discard(events)
+
+    def publish(self, event, data):
+        """Send an event to every subscriber"""
+        with self.lock:
+            subscribers = list(self.subscribers)
+            self.published += 1
+        for events in subscribers:
+            try:
+                events.put_nowait((event, data))
+            except queue.Full:
+                # Slow reader: drop its oldest event to make room
+                try:
+                    events.get_nowait()
+                except queue.Empty:
+                    pass
+                events.put_nowait((event, data))
+
+    def _on_logs(self, message):
+        """attendance_logs stream: put/patch of one or more new log entries"""
+        path, data = message.get("path", "/"), message.get("data")
+        if path == "/":
+            logs = data if isinstance(data, dict) else {}
+        else:
+            logs = {path.strip("/"): data}
+
+        for key in sorted(logs):
+            log = logs[key]
+            if not isinstance(log, dict) or "student_id" not in log:
+                continue
+            recognition = {
+                "key": key,
+                "student_id": log.get("student_id"),
+                "student_name": log.get("student_name"),
+                "lecture": log.get("lecture"),
+                "time": log.get("time"),
+                "confidence": log.get("confidence"),
+                "room": log.get("room"),
+            }
+            with self.lock:
+                self.last_recognition = recognition
+            self.publish("recognition", recognition)
+
+    def _on_status(self, message):
+        """laptop2_status stream: keep a merged copy and publish it on every change"""
+        path, data = message.get("path", "/"), message.get("data")
+        with self.lock:
+            if path == "/":
+                if message.get("event") == "put":
+                    self.status = {}
+                if isinstance(data, dict):
+                    self.status.update(data)
+            else:
+                field = path.strip("/")
+                if "/" in field:
+                    # Nested change inside the pipeline stats, which dashboards do not receive
+                    return
+                if data is None:
+                    self.status.pop(field, None)
+                else:
+                    self.status[field] = data
+            status = self._public_status()
+        self.publish("status", status)
+
+    def _public_status(self):
+        """Status fields sent to dashboards; the bulky pipeline stats stay upstream"""
+        return {key: value for key, value in self.status.items() if key != "pipeline"}
+
+    @staticmethod
+    def format_event(event, data):
+        """One Server-Sent Events message"""
+        return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+    def stats(self):
+        with self.lock:
+            return {"subscribers": len(self.subscribers), "streams": len(self.streams), "published": self.published}
+
+    def close(self):
+        for stream in self.streams:
+            try:
+                stream.close()
+            except Exception:
+                pass
+        self.streams = []
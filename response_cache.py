@@ -0,0 +1,57 @@
+import hashlib
+import json
+import threading
+import time
+
+class ResponseCache:
+    """Serialized JSON payloads shared by all requests, with TTLs and invalidation"""
+
+    def __init__(self):
+        self.entries = {}  # key -> (body, etag, expires_at)
+        self.lock = threading.Lock()
+        self.key_locks = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _key_lock(self, key):
+        with self.lock:
+            return self.key_locks.setdefault(key, threading.Lock())
+
+    def _fresh(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry and entry[2] > time.monotonic():
+                self.hits += 1
+                return entry[0], entry[1]
+        return None
+
+    def get(self, key, ttl, loader):
+        """Return (body, etag) for key, calling loader() for the data when missing or expired"""
+        cached = self._fresh(key)
+        if cached:
+            return cached
+
+        with self._key_lock(key):
+            # Another request may have loaded it while we waited
+            cached = self._fresh(key)
+            if cached:
+                return cached
+
+            body = json.dumps(loader(), sort_keys=True).encode('utf-8')
+            etag = hashlib.sha1(body).hexdigest()
+            with self.lock:
+                self.entries[key] = (body, etag, time.monotonic() + ttl)
+                self.misses += 1
+            return body, etag
+
+    def invalidate(self, *keys):
+        """Drop the given keys, or everything when none are given"""
+        with self.lock:
+            if not keys:
+                self.entries.clear()
+            for key in keys:
+                self.entries.pop(key, None)
+
+    def stats(self):
+        with self.lock:
+            return {"entries": len(self.entries), "hits": self.hits, "misses": self.misses}
@@ -7,7 +7,6 @@ let attendanceData = {};
 document.addEventListener('DOMContentLoaded', function() {
     loadStudents();
     loadAttendance();
-    updateSystemStatus();
 
     // Set up photo capture functionality
     setupPhotoCapture();
@@ -15,8 +14,8 @@ document.addEventListener('DOMContentLoaded', function() {
     // Set up form submission
     document.getElementById('studentForm').addEventListener('submit', handleStudentRegistration);
 
-    // Update system status every 30 seconds
-    setInterval(updateSystemStatus, 30000);
+    // System status is fetched when the live event stream opens, then pushed over it
+    subscribeLiveUpdates();
 });
 
 // View Management
@@ -123,7 +122,12 @@ async function handleStudentRegistration(e) {
             body: JSON.stringify(formData)
         });
 
-        const result = await response.json();
+        let result = await response.json();
+
+        // Registration runs in the background; wait for its job to finish
+        if (result.success && result.job_id) {
+            result = await waitForEnrollment(result.job_id);
+        }
 
         if (result.success) {
             alert('Student registered successfully!');
@@ -150,11 +154,32 @@ async function handleStudentRegistration(e) {
     }
 }
 
+async function waitForEnrollment(jobId) {
+    while (true) {
+        await new Promise(resolve => setTimeout(resolve, 1000));
+        const response = await fetch('/api/enrollment-jobs/' + jobId);
+        const job = await response.json();
+        if (!response.ok) return { success: false, message: job.error };
+        if (job.status === 'done') return { success: true, message: job.message };
+        if (job.status === 'failed') return { success: false, message: job.message };
+    }
+}
+
 // Data Loading Functions
 async function loadStudents() {
     try {
-        const response = await fetch('/api/students');
-        students = await response.json();
+        // Listing is paginated; follow the cursor and key students by id
+        const params = new URLSearchParams();
+        let loaded = {};
+        let cursor = null;
+        do {
+            if (cursor) params.set('cursor', cursor);
+            const response = await fetch('/api/students?' + params);
+            if (!response.ok) throw new Error((await response.json()).error || response.statusText);
+            (await response.json()).forEach(student => { loaded[student.id] = student; });
+            cursor = response.headers.get('X-Next-Cursor');
+        } while (cursor);
+        students = loaded;
     } catch (error) {
         console.error('Error loading students:', error);
     }
@@ -181,8 +206,16 @@ async function generateReport() {
         if (startDate) params.append('start_date', startDate);
         if (endDate) params.append('end_date', endDate);
 
-        const response = await fetch('/api/attendance/report?' + params);
-        const reportData = await response.json();
+        // Reports are paginated; follow the cursor until the last page
+        let reportData = [];
+        let cursor = null;
+        do {
+            if (cursor) params.set('cursor', cursor);
+            const response = await fetch('/api/attendance/report?' + params);
+            if (!response.ok) throw new Error((await response.json()).error || response.statusText);
+            reportData = reportData.concat(await response.json());
+            cursor = response.headers.get('X-Next-Cursor');
+        } while (cursor);
 
         displayReport(reportData);
     } catch (error) {
@@ -376,6 +409,32 @@ async function updateSystemStatus() {
     }
 }
 
+// Live updates pushed by the server instead of polling
+function subscribeLiveUpdates() {
+    const source = new EventSource('/api/live');
+
+    source.addEventListener('status', event => {
+        const status = JSON.parse(event.data);
+        document.getElementById('laptop2Status').textContent = status.status || 'Disconnected';
+        if (status.last_update) {
+            document.getElementById('lastSync').textContent = new Date(status.last_update).toLocaleString();
+        }
+    });
+
+    source.addEventListener('recognition', event => {
+        const recognition = JSON.parse(event.data);
+        const confidence = recognition.confidence != null ? ` (${(recognition.confidence * 100).toFixed(0)}%)` : '';
+        document.getElementById('lastRecognition').textContent =
+            `${recognition.student_name} - Lecture ${recognition.lecture}${confidence}`;
+    });
+
+    // EventSource reconnects by itself; reflect the outage meanwhile
+    source.onerror = () => {
+        document.getElementById('systemStatusIndicator').style.background = '#ef4444';
+    };
+    source.onopen = () => updateSystemStatus();
+}
+
 // Utility Functions
 function logout() {
     if (confirm('Are you sure you want to logout?')) {